@@ -1,67 +1,358 @@
 import os
-import tempfile
+import json
 import logging
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import numpy as np
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from faster_whisper import WhisperModel
+from prometheus_fastapi_instrumentator import Instrumentator
+import formats
+import metrics
+from batching import MicroBatcher, transcribe_batch
+from inference import InferenceExecutor, QueueFullError
+from ingest import SAMPLE_RATE, decode_upload, probe_duration
+from model_registry import ModelRegistry, UnknownModelError
+from transcript_cache import TranscriptCache
+from windows import plan_windows, shift_segment, transcribe_windows
 
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="ASR Service")
+Instrumentator().instrument(app).expose(app, endpoint="/metrics")
+
+# Default model, and the models requests may pick with ?model=
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "large-v3")
+ASR_MODELS = [m.strip() for m in os.getenv("ASR_MODELS", WHISPER_MODEL).split(",") if m.strip()]
+ASR_MODEL_MEMORY_MB = int(os.getenv("ASR_MODEL_MEMORY_MB", "16384"))
+
+# "auto" picks CUDA when available; use cpu + int8 on CPU-only nodes
+ASR_DEVICE = os.getenv("ASR_DEVICE", "auto")
+ASR_DEVICE_INDEX = [int(i) for i in os.getenv("ASR_DEVICE_INDEX", "0").split(",")]
+ASR_COMPUTE_TYPE = os.getenv("ASR_COMPUTE_TYPE", "default")
+
+TRANSCRIBE_OPTIONS = {"beam_size": 5, "vad_filter": True, "word_timestamps": True}
+
+# Concurrent decodes and how many more requests may wait for a slot
+ASR_WORKERS = int(os.getenv("ASR_WORKERS", "1"))
+ASR_MAX_QUEUE = int(os.getenv("ASR_MAX_QUEUE", "4"))
+
+# Split recordings longer than ASR_WINDOW_SECONDS at silences and decode
+# the windows on this many model replicas at once (1 disables it)
+ASR_WINDOW_REPLICAS = int(os.getenv("ASR_WINDOW_REPLICAS", "1"))
+ASR_WINDOW_SECONDS = float(os.getenv("ASR_WINDOW_SECONDS", "300"))
 
-# Load model at startup
-model = WhisperModel(
-    os.getenv("WHISPER_MODEL", "large-v3"),
-    device="cuda",
-    compute_type="float16"
+# Optional cross-request batching of short clips
+ASR_BATCHING = os.getenv("ASR_BATCHING", "false").lower() == "true"
+ASR_BATCH_MAX_SIZE = int(os.getenv("ASR_BATCH_MAX_SIZE", "8"))
+ASR_BATCH_MAX_WAIT_MS = float(os.getenv("ASR_BATCH_MAX_WAIT_MS", "50"))
+ASR_BATCH_MAX_SECONDS = float(os.getenv("ASR_BATCH_MAX_SECONDS", "30"))
+
+# Local transcript cache keyed by audio hash + decode parameters (0 disables it)
+# Outside Docker the cache lives in the temp dir; compose mounts a persistent one
+ASR_CACHE_DIR = os.getenv("ASR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "asr-transcripts"))
+ASR_CACHE_MAX_BYTES = int(os.getenv("ASR_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Everything that changes the transcript for the same audio
+DECODE_PARAMS = {
+    **TRANSCRIBE_OPTIONS,
+    "window_seconds": ASR_WINDOW_SECONDS if ASR_WINDOW_REPLICAS > 1 else None,
+    "batch_max_seconds": ASR_BATCH_MAX_SECONDS if ASR_BATCHING else None,
+}
+
+
+def _load_model(name: str) -> WhisperModel:
+    t0 = time.perf_counter()
+    model = WhisperModel(
+        name,
+        device=ASR_DEVICE,
+        device_index=ASR_DEVICE_INDEX,
+        compute_type=ASR_COMPUTE_TYPE,
+        num_workers=ASR_WORKERS * max(1, ASR_WINDOW_REPLICAS)
+    )
+    metrics.MODEL_LOAD_SECONDS.labels(name).observe(time.perf_counter() - t0)
+    return model
+
+
+# Models are loaded on first use, not at import
+registry = ModelRegistry(
+    allowed=ASR_MODELS,
+    default=WHISPER_MODEL,
+    budget_bytes=ASR_MODEL_MEMORY_MB * 1024 * 1024,
+    loader=_load_model
 )
 
+executor = InferenceExecutor(
+    workers=ASR_WORKERS,
+    max_queue=ASR_MAX_QUEUE,
+    default_job_seconds=float(os.getenv("ASR_EXPECTED_JOB_SECONDS", "60"))
+)
+metrics.track_executor(executor)
 
-@app.post("/transcribe")
-async def transcribe(file: UploadFile = File(default=...)):
-    """Transcribe audio file to text using Whisper."""
-    temp_path = None
+
+async def _run_batch(model_name, audios):
+    """Decode one micro-batch on the executor so it counts against admission."""
+    def job(emit):
+        with registry.acquire(model_name) as model:
+            t0 = time.perf_counter()
+            with metrics.stage("decode"):
+                outs = transcribe_batch(
+                    model,
+                    audios,
+                    beam_size=TRANSCRIBE_OPTIONS["beam_size"],
+                    word_timestamps=TRANSCRIBE_OPTIONS["word_timestamps"]
+                )
+            elapsed = time.perf_counter() - t0
+            total = sum(out["duration"] for out in outs)
+            for out in outs:
+                # Each clip is charged its share of the batch time
+                metrics.observe_transcription(model_name, out["duration"], elapsed * out["duration"] / (total or 1))
+            emit(outs)
+    return [r async for r in executor.submit(job)][0]
+
+
+window_pool = (
+    ThreadPoolExecutor(max_workers=ASR_WORKERS * ASR_WINDOW_REPLICAS, thread_name_prefix="window")
+    if ASR_WINDOW_REPLICAS > 1 else None
+)
+
+batcher = MicroBatcher(_run_batch, ASR_BATCH_MAX_SIZE, ASR_BATCH_MAX_WAIT_MS) if ASR_BATCHING else None
+
+cache = TranscriptCache(ASR_CACHE_DIR, ASR_CACHE_MAX_BYTES) if ASR_CACHE_MAX_BYTES > 0 else None
+
+
+def _segment_to_dict(s) -> dict:
+    return {
+        "start": s.start,
+        "end": s.end,
+        "text": s.text,
+        "words": [
+            {"start": w.start, "end": w.end, "word": w.word}
+            for w in (s.words or [])
+        ]
+    }
+
+
+def _decode(fileobj) -> np.ndarray:
+    with metrics.stage("audio_decode"):
+        return decode_upload(fileobj)
+
+
+def _transcribe_window(model: WhisperModel, pcm: np.ndarray) -> tuple[str, list[dict]]:
+    segments, info = model.transcribe(pcm, **TRANSCRIBE_OPTIONS)
+    return info.language, [_segment_to_dict(s) for s in segments]
+
+
+def _transcribe(audio, model_name: str, emit, offset: float = 0.0) -> None:
+    t0 = time.perf_counter()
+    blocked = 0.0  # time spent waiting for the consumer, not decoding
+
+    def timed_emit(item):
+        nonlocal blocked
+        t = time.perf_counter()
+        emit(item)
+        blocked += time.perf_counter() - t
+
+    pcm = audio if isinstance(audio, np.ndarray) else _decode(audio)
+    full_duration = pcm.shape[0] / SAMPLE_RATE
+    if offset > 0:
+        pcm = pcm[int(offset * SAMPLE_RATE):]
+    duration = pcm.shape[0] / SAMPLE_RATE
+    t_acquire = time.perf_counter()
+    with registry.acquire(model_name) as model:
+        t0 += time.perf_counter() - t_acquire  # model loading is measured separately
+        if window_pool is not None and duration > ASR_WINDOW_SECONDS:
+            with metrics.stage("vad"):
+                windows = plan_windows(pcm, ASR_WINDOW_SECONDS)
+            t_decode = time.perf_counter()
+            language, segments = transcribe_windows(
+                partial(_transcribe_window, model), pcm, windows, window_pool
+            )
+            timed_emit({"language": language, "duration": full_duration})
+        else:
+            # faster-whisper runs VAD, feature extraction and language
+            # detection here; segments are generated lazily below
+            with metrics.stage("vad"):
+                segments, info = model.transcribe(pcm, **TRANSCRIBE_OPTIONS)
+            t_decode = time.perf_counter()
+            timed_emit({"language": info.language, "duration": full_duration})
+            segments = map(_segment_to_dict, segments)
+        for s in segments:
+            timed_emit(shift_segment(s, offset) if offset else s)
+        metrics.STAGE_SECONDS.labels("decode").observe(time.perf_counter() - t_decode - blocked)
+    metrics.observe_transcription(model_name, duration, time.perf_counter() - t0 - blocked)
+
+
+def _transcribe_job(audio, model_name: str, cache_key: str | None = None, offset: float = 0.0):
+    """Build an executor job that transcribes ``audio`` and emits info, then segments.
+
+    ``audio`` is either decoded PCM or the upload's file object, which is
+    then decoded on the worker thread. Long recordings are split into
+    windows decoded in parallel when ``ASR_WINDOW_REPLICAS`` > 1. With a
+    ``cache_key`` every record is also written to the transcript cache,
+    which publishes the entry only if the whole transcription succeeds.
+    With an ``offset`` only audio after it is decoded; timestamps stay
+    relative to the start of the recording.
+    """
+    def job(emit):
+        if cache_key is None:
+            _transcribe(audio, model_name, emit, offset)
+            return
+        writer = cache.writer(cache_key)
+
+        def emit_and_cache(item):
+            writer.write(item)
+            emit(item)
+
+        try:
+            _transcribe(audio, model_name, emit_and_cache, offset)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+    return job
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+async def _stream_ndjson(language: str, duration: float, segments, columnar: bool = False):
+    """Yield one JSON line per segment as soon as Whisper decodes it.
+
+    The first line carries the transcription info, the last one is a
+    ``done`` marker so clients can tell a complete stream from a cut one.
+    Errors after the response has started are reported in-band. With
+    ``columnar`` each segment's words are sent as parallel arrays.
+    """
     try:
-        suffix = os.path.splitext(file.filename or "")[1] or ".wav"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            temp_path = tmp.name
-        
-        segments, info = model.transcribe(
-            temp_path,
-            beam_size=5,
-            vad_filter=True,
-            word_timestamps=True
+        yield json.dumps(
+            {"type": "info", "language": language, "duration": duration},
+            ensure_ascii=False
+        ) + "\n"
+        count = 0
+        async for s in segments:
+            count += 1
+            if columnar:
+                s = {**s, "words": formats.columnar_words(s["words"])}
+            yield json.dumps({"type": "segment", **s}, ensure_ascii=False) + "\n"
+        yield json.dumps({"type": "done", "segments": count}) + "\n"
+    except Exception as e:
+        logger.exception(f"Streaming transcription failed: {e}")
+        yield json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
+
+
+async def _respond(media: str, info: dict, segments):
+    """Encode a transcript whose segments arrive through an async iterator as ``media``."""
+    if media in formats.STREAMING:
+        return StreamingResponse(
+            _stream_ndjson(
+                info["language"], info["duration"], segments,
+                columnar=media == formats.COLUMNAR_NDJSON
+            ),
+            media_type=media
         )
-        
-        out = {
-            "language": info.language,
-            "duration": info.duration,
-            "segments": [
-                {
-                    "start": s.start,
-                    "end": s.end,
-                    "text": s.text,
-                    "words": [
-                        {"start": w.start, "end": w.end, "word": w.word}
-                        for w in (s.words or [])
-                    ]
-                }
-                for s in segments
-            ]
+    if media == formats.JSON:
+        return {
+            "language": info["language"],
+            "duration": info["duration"],
+            "segments": [s async for s in segments]
         }
-        return out
+    builder = formats.ColumnarBuilder(info["language"], info["duration"])
+    async for s in segments:
+        builder.add(s)
+    if media == formats.MSGPACK:
+        return Response(builder.to_msgpack(), media_type=formats.MSGPACK)
+    return JSONResponse(builder.to_dict(), media_type=formats.COLUMNAR_JSON)
+
+
+@app.post("/transcribe")
+async def transcribe(
+    request: Request,
+    file: UploadFile = File(default=...),
+    stream: bool = False,
+    model: str | None = None,
+    offset: float = 0.0
+):
+    """Transcribe audio file to text using Whisper.
+
+    With ``?stream=true`` or ``Accept: application/x-ndjson`` segments are
+    sent as NDJSON lines while decoding progresses. Compact columnar
+    encodings (JSON, NDJSON or msgpack, see ``formats``) are chosen through
+    the ``Accept`` header. Returns 503 with a
+    ``Retry-After`` header when the inference queue is full. When batching
+    is enabled, clips up to ``ASR_BATCH_MAX_SECONDS`` are decoded together
+    with other requests' clips. Audio already transcribed with the same
+    decode parameters is answered from the transcript cache. ``?model=``
+    selects one of the configured models (``ASR_MODELS``). ``?offset=``
+    resumes an interrupted transcription: only audio after that many
+    seconds is decoded, with timestamps still relative to the start.
+    """
+    try:
+        model_name = registry.resolve(model)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must be >= 0")
+    media = formats.negotiate(request.headers.get("accept", ""), stream)
+    metrics.BYTES_RECEIVED.inc(file.size or 0)
+
+    try:
+        cache_key = None
+        if cache is not None:
+            params = {**DECODE_PARAMS, "model": model_name}
+            if offset:
+                params["offset"] = offset
+            cache_key = await run_in_threadpool(cache.key, file.file, params)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                metrics.CACHE_HITS.inc()
+                info, *segments = await run_in_threadpool(list, cached)
+                return await _respond(media, info, _aiter(segments))
+
+        # Decode from the spooled upload itself: no extra copy in RAM or on disk
+        audio = file.file
+        if batcher is not None and not offset:
+            # Only short clips are decoded before admission; anything longer
+            # (or of unknown length) is decoded on the executor as usual
+            duration = await run_in_threadpool(probe_duration, file.file)
+            if duration is not None and duration <= ASR_BATCH_MAX_SECONDS:
+                audio = await run_in_threadpool(_decode, file.file)
+            if isinstance(audio, np.ndarray) and audio.shape[0] <= ASR_BATCH_MAX_SECONDS * SAMPLE_RATE:
+                out = await batcher.submit(audio, key=model_name)
+                info = {"language": out["language"], "duration": out["duration"]}
+                if cache_key is not None:
+                    await run_in_threadpool(cache.put, cache_key, [info, *out["segments"]])
+                return await _respond(media, info, _aiter(out["segments"]))
+
+        results = executor.submit(_transcribe_job(audio, model_name, cache_key, offset))
+        # Wait for the info item so decode errors still map to a 500;
+        # the upload has been fully decoded once it arrives
+        info = await anext(results)
+        return await _respond(media, info, results)
+    except QueueFullError as e:
+        logger.warning(f"Rejecting transcription: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="ASR queue is full",
+            headers={"Retry-After": str(e.retry_after)}
+        ) from e
     except Exception as e:
         logger.exception(f"Transcription failed: {e}")
         raise HTTPException(status_code=500, detail=str(e)) from e
-    finally:
-        if temp_path:
-            try:
-                os.unlink(temp_path)
-            except OSError as e:
-                logger.warning(f"Failed to delete temp file {temp_path}: {e}")
 
 
 @app.get("/health")
 def health():
-    return {"ok": True, "model": os.getenv("WHISPER_MODEL", "large-v3")}
+    return {
+        "ok": True,
+        "model": WHISPER_MODEL,
+        **executor.stats(),
+        "models": registry.stats(),
+        "cache": cache.stats() if cache is not None else None
+    }
@@ -0,0 +1,185 @@
+"""Cross-request micro-batching for short clips."""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+import numpy as np
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_ctranslate2_storage, get_suppressed_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collect items submitted by concurrent requests and run them together.
+
+    A batch is flushed when ``max_batch`` items with the same key are
+    pending or ``max_wait_ms`` after the first of them arrived, whichever
+    comes first. ``run_batch`` receives the key and the list of items and
+    must return one result per item, in order.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, list], Awaitable[list]],
+        max_batch: int = 8,
+        max_wait_ms: float = 50.0
+    ):
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending: dict[Hashable, list[tuple[Any, asyncio.Future]]] = defaultdict(list)
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item: Any, key: Hashable = None) -> Any:
+        """Queue ``item`` for the next batch with ``key`` and wait for its result."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        pending = self._pending[key]
+        pending.append((item, fut))
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await fut
+
+    def _flush(self, key: Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        logger.debug(f"Running batch of {len(batch)} for key {key!r}")
+        try:
+            results = await self.run_batch(key, [item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+
+def _encode(model, features: np.ndarray, to_cpu: bool):
+    return model.model.encode(get_ctranslate2_storage(features), to_cpu=to_cpu)
+
+
+def _words_from_alignment(model, tokenizer: Tokenizer, text_tokens: list[int], result) -> list[dict]:
+    """Turn one batched ``align`` result into word timings (see ``WhisperModel.find_alignment``)."""
+    words, word_tokens = tokenizer.split_to_word_tokens(text_tokens + [tokenizer.eot])
+    if len(word_tokens) <= 1:
+        return []
+    word_boundaries = np.pad(np.cumsum([len(t) for t in word_tokens[:-1]]), (1, 0))
+    text_indices = np.array([pair[0] for pair in result.alignments])
+    time_indices = np.array([pair[1] for pair in result.alignments])
+    jumps = np.pad(np.diff(text_indices), (1, 0), constant_values=1).astype(bool)
+    jump_times = time_indices[jumps] / model.tokens_per_second
+    starts = jump_times[word_boundaries[:-1]]
+    ends = jump_times[word_boundaries[1:]]
+    return [
+        {"start": round(float(start), 2), "end": round(float(end), 2), "word": word}
+        for word, start, end in zip(words, starts, ends)
+        if word
+    ]
+
+
+def transcribe_batch(
+    model,
+    audios: list[np.ndarray],
+    language: Optional[str] = None,
+    beam_size: int = 5,
+    word_timestamps: bool = True
+) -> list[dict]:
+    """Decode several clips of at most 30 s in one encoder/decoder call.
+
+    Each clip fits in a single Whisper window, so it is decoded without
+    timestamp tokens or temperature fallback and returned as one segment
+    spanning its speech. The output matches the ``/transcribe`` JSON body.
+    """
+    fe = model.feature_extractor
+    n_frames = fe.nb_max_frames
+    features = []
+    num_frames = []
+    durations = []
+    for audio in audios:
+        mel = fe(audio)[:, :n_frames]
+        if mel.shape[-1] < n_frames:
+            mel = np.pad(mel, [(0, 0), (0, n_frames - mel.shape[-1])])
+        features.append(mel)
+        num_frames.append(min(audio.shape[0] // fe.hop_length, n_frames))
+        durations.append(audio.shape[0] / fe.sampling_rate)
+    features = np.stack(features)
+
+    to_cpu = model.model.device == "cuda" and len(model.model.device_index) > 1
+    encoder_output = _encode(model, features, to_cpu)
+
+    if language is not None or not model.model.is_multilingual:
+        languages = [language or "en"] * len(audios)
+    else:
+        detected = model.model.detect_language(encoder_output)
+        languages = [probs[0][0][2:-2] for probs in detected]
+
+    groups: dict[str, list[int]] = defaultdict(list)
+    for i, lang in enumerate(languages):
+        groups[lang].append(i)
+
+    results: list[Optional[dict]] = [None] * len(audios)
+    for lang, indices in groups.items():
+        if len(groups) > 1:
+            # Prompts and alignment take one start sequence per call
+            group_output = _encode(model, features[indices], to_cpu)
+        else:
+            group_output = encoder_output
+        tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language=lang)
+        prompt = [*tokenizer.sot_sequence, tokenizer.no_timestamps]
+        generated = model.model.generate(
+            group_output,
+            [prompt] * len(indices),
+            beam_size=beam_size,
+            max_length=model.max_length,
+            suppress_blank=True,
+            suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+        )
+        tokens = [[t for t in g.sequences_ids[0] if t < tokenizer.eot] for g in generated]
+
+        alignments = {}
+        if word_timestamps:
+            keep = [j for j, toks in enumerate(tokens) if toks]
+            if keep:
+                if len(keep) == len(indices):
+                    align_output = group_output
+                else:
+                    align_output = _encode(model, features[[indices[j] for j in keep]], to_cpu)
+                aligned = model.model.align(
+                    align_output,
+                    tokenizer.sot_sequence,
+                    [tokens[j] for j in keep],
+                    [num_frames[indices[j]] for j in keep]
+                )
+                alignments = dict(zip(keep, aligned))
+
+        for j, i in enumerate(indices):
+            text = tokenizer.decode(tokens[j])
+            words = []
+            if j in alignments:
+                words = _words_from_alignment(model, tokenizer, tokens[j], alignments[j])
+            segments = []
+            if text.strip():
+                segments.append({
+                    "start": words[0]["start"] if words else 0.0,
+                    "end": words[-1]["end"] if words else round(durations[i], 2),
+                    "text": text,
+                    "words": words
+                })
+            results[i] = {"language": lang, "duration": durations[i], "segments": segments}
+    return results
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Measure ASR real-time factor, latency, throughput and peak memory.
+
+Builds (or loads) a corpus of WAV files of varied lengths and transcribes
+every file under each combination of model, compute type, beam size and
+VAD setting. The service is driven either in-process, which decodes with
+``ingest`` and calls ``WhisperModel.transcribe`` directly (no executor,
+windowing, batching or transcript cache, so it measures the model alone),
+or over HTTP against a running ``/transcribe`` endpoint. Results are written as JSON, and ``--compare``
+prints the change against an earlier results file. CPU-only example:
+
+    python benchmarks/bench_rtf.py --models tiny,base --compute-types int8,float32 \\
+        --beam-sizes 1,5 --vad on,off --output results.json
+
+Over HTTP only the model can vary per request; compute type, beam size
+and VAD are whatever the server runs with. Each upload carries a random
+extra WAV chunk so the server's transcript cache never answers a timed
+request; the cache counters from ``/health`` are recorded in ``meta``.
+Pass ``--server-pid`` to sample the server's memory instead of this
+process's.
+"""
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import statistics
+import struct
+import sys
+import threading
+import time
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import SAMPLE_RATE, decode_upload  # noqa: E402
+
+
+def synthetic_speech(seconds: float, seed: int) -> np.ndarray:
+    """Voice-like bursts of 1-6 s separated by 0.3-2 s pauses, plus noise."""
+    rng = np.random.default_rng(seed)
+    out = rng.normal(0, 0.003, int(seconds * SAMPLE_RATE)).astype(np.float32)
+    pos = int(rng.uniform(0.2, 1.0) * SAMPLE_RATE)
+    while pos < out.shape[0]:
+        n = min(int(rng.uniform(1, 6) * SAMPLE_RATE), out.shape[0] - pos)
+        t = np.arange(n) / SAMPLE_RATE
+        f0 = rng.uniform(100, 220)
+        voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 5))
+        envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 5) * t))
+        out[pos:pos + n] += 0.1 * voice * envelope
+        pos += n + int(rng.uniform(0.3, 2.0) * SAMPLE_RATE)
+    return out
+
+
+def _write_wav(path: str, audio: np.ndarray) -> None:
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def load_corpus(directory: str, lengths: list[float], per_length: int) -> list[dict]:
+    """Return ``{"path", "seconds"}`` for every WAV in ``directory``, creating them if empty."""
+    os.makedirs(directory, exist_ok=True)
+    paths = sorted(glob.glob(os.path.join(directory, "*.wav")))
+    if not paths:
+        for seconds in lengths:
+            for i in range(per_length):
+                path = os.path.join(directory, f"synthetic_{seconds:g}s_{i}.wav")
+                _write_wav(path, synthetic_speech(seconds, seed=int(seconds * 1000) + i))
+                paths.append(path)
+    corpus = []
+    for path in paths:
+        with wave.open(path, "rb") as w:
+            corpus.append({"path": path, "seconds": w.getnframes() / w.getframerate()})
+    return corpus
+
+
+class PeakRSS:
+    """Sample the resident set size of ``pid`` in a background thread (Linux)."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.path = f"/proc/{pid}/statm"
+        self.interval = interval
+        self.page = os.sysconf("SC_PAGE_SIZE")
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _rss(self) -> int:
+        try:
+            with open(self.path) as f:
+                return int(f.read().split()[1]) * self.page
+        except (OSError, IndexError, ValueError):
+            return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start = self._rss()
+        self.peak = self.start
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+class InProcessRunner:
+    """Decode and transcribe like ``asr_service`` does, without the HTTP layer."""
+
+    def __init__(self, model: str, compute_type: str, concurrency: int, language: str):
+        from faster_whisper import WhisperModel
+
+        t0 = time.perf_counter()
+        self.model = WhisperModel(model, device="cpu", compute_type=compute_type, num_workers=concurrency)
+        self.load_seconds = time.perf_counter() - t0
+        self.language = language
+
+    def __call__(self, path: str, beam_size: int, vad: bool) -> None:
+        with open(path, "rb") as f:
+            audio = decode_upload(f)
+        segments, _ = self.model.transcribe(
+            audio,
+            language=self.language,
+            beam_size=beam_size,
+            vad_filter=vad,
+            word_timestamps=True
+        )
+        for _ in segments:
+            pass
+
+
+def with_nonce(wav: bytes) -> bytes:
+    """``wav`` with a random chunk after the RIFF header; decoders skip unknown chunks."""
+    chunk = b"bnch" + struct.pack("<I", 16) + uuid.uuid4().bytes
+    return wav[:4] + struct.pack("<I", struct.unpack("<I", wav[4:8])[0] + len(chunk)) + wav[8:12] + chunk + wav[12:]
+
+
+class HttpRunner:
+    """POST each file to a running ``/transcribe`` endpoint, never twice with the same bytes."""
+
+    def __init__(self, url: str, model: str):
+        import requests
+
+        self.session = requests.Session()
+        self.url = url
+        self.model = model
+        self.load_seconds = None
+
+    def __call__(self, path: str, beam_size: int, vad: bool) -> None:
+        with open(path, "rb") as f:
+            data = with_nonce(f.read())
+        r = self.session.post(
+            self.url,
+            params={"model": self.model},
+            files={"file": (os.path.basename(path), data, "audio/wav")},
+            timeout=3600
+        )
+        r.raise_for_status()
+
+
+def server_cache_stats(url: str) -> dict | None:
+    """Transcript cache counters from the service's ``/health``, None if it has no cache."""
+    import requests
+
+    r = requests.get(url.rsplit("/", 1)[0] + "/health", timeout=30)
+    r.raise_for_status()
+    return r.json().get("cache")
+
+
+def _percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_config(runner, corpus: list[dict], beam_size: int, vad: bool, args) -> dict:
+    def one(item):
+        t0 = time.perf_counter()
+        runner(item["path"], beam_size, vad)
+        return time.perf_counter() - t0
+
+    # Warm-up on the shortest file so one-off init cost is not timed
+    one(min(corpus, key=lambda c: c["seconds"]))
+
+    pid = args.server_pid or os.getpid()
+    items = corpus * args.repeat
+    with PeakRSS(pid) as mem, ThreadPoolExecutor(args.concurrency) as pool:
+        t0 = time.perf_counter()
+        latencies = list(pool.map(one, items))
+        wall = time.perf_counter() - t0
+
+    audio_seconds = sum(c["seconds"] for c in items)
+    per_length = {}
+    for item, latency in zip(items, latencies):
+        per_length.setdefault(round(item["seconds"]), []).append(latency / item["seconds"])
+    return {
+        "files": len(items),
+        "audio_seconds": round(audio_seconds, 2),
+        "wall_seconds": round(wall, 3),
+        # Summed per-file processing time over audio time; < 1 is faster than real time
+        "rtf": round(sum(latencies) / audio_seconds, 4),
+        "rtf_by_length": {str(k): round(statistics.mean(v), 4) for k, v in sorted(per_length.items())},
+        "latency_p50": round(_percentile(latencies, 50), 3),
+        "latency_p95": round(_percentile(latencies, 95), 3),
+        "throughput_audio_seconds_per_second": round(audio_seconds / wall, 3),
+        "throughput_files_per_second": round(len(items) / wall, 3),
+        "peak_rss_mb": round(mem.peak / 2**20, 1),
+        "rss_growth_mb": round((mem.peak - mem.start) / 2**20, 1),
+    }
+
+
+def _key(result: dict) -> tuple:
+    return tuple(result[k] for k in ("model", "compute_type", "beam_size", "vad"))
+
+
+def compare(current: list[dict], previous_path: str) -> None:
+    with open(previous_path) as f:
+        previous = {_key(r): r for r in json.load(f)["results"]}
+    print(f"\nChange vs {previous_path} (negative rtf/latency is better):")
+    for r in current:
+        old = previous.get(_key(r))
+        if not old:
+            print(f"  {_key(r)}: no baseline")
+            continue
+        deltas = []
+        for metric in ("rtf", "latency_p50", "latency_p95", "peak_rss_mb"):
+            if old[metric]:
+                deltas.append(f"{metric} {100 * (r[metric] - old[metric]) / old[metric]:+.1f}%")
+        print(f"  {_key(r)}: " + ", ".join(deltas))
+
+
+def _csv(value: str) -> list[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default="benchmarks/corpus", help="WAV directory, filled with synthetic audio if empty")
+    parser.add_argument("--lengths", default="5,30,120,600", help="synthetic file lengths in seconds")
+    parser.add_argument("--per-length", type=int, default=2)
+    parser.add_argument("--url", help="benchmark a running service, e.g. http://localhost:7000/transcribe")
+    parser.add_argument("--server-pid", type=int, help="sample this process's memory (HTTP mode)")
+    parser.add_argument("--models", default=os.getenv("WHISPER_MODEL", "tiny"))
+    parser.add_argument("--compute-types", default="int8")
+    parser.add_argument("--beam-sizes", default="5")
+    parser.add_argument("--vad", default="on", help="comma list of on/off")
+    parser.add_argument("--language", default="fa")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="bench_rtf.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, [float(s) for s in _csv(args.lengths)], args.per_length)
+    print(f"Corpus: {len(corpus)} files, {sum(c['seconds'] for c in corpus):.0f}s of audio", file=sys.stderr)
+
+    if args.url:
+        # The server fixes everything but the model
+        grid = [(m, "server", None, None) for m in _csv(args.models)]
+    else:
+        grid = list(itertools.product(
+            _csv(args.models),
+            _csv(args.compute_types),
+            [int(b) for b in _csv(args.beam_sizes)],
+            [v == "on" for v in _csv(args.vad)]
+        ))
+
+    cache_before = server_cache_stats(args.url) if args.url else None
+    results = []
+    runners = {}
+    for model, compute_type, beam_size, vad in grid:
+        if (model, compute_type) not in runners:
+            runners.clear()  # keep one model in memory at a time
+            runners[model, compute_type] = (
+                HttpRunner(args.url, model) if args.url
+                else InProcessRunner(model, compute_type, args.concurrency, args.language)
+            )
+        runner = runners[model, compute_type]
+        print(f"Running model={model} compute_type={compute_type} beam_size={beam_size} vad={vad}", file=sys.stderr)
+        result = {
+            "model": model,
+            "compute_type": compute_type,
+            "beam_size": beam_size,
+            "vad": vad,
+            "model_load_seconds": runner.load_seconds and round(runner.load_seconds, 2),
+            **run_config(runner, corpus, beam_size, vad, args),
+        }
+        print(json.dumps(result), file=sys.stderr)
+        results.append(result)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "mode": "http" if args.url else "in-process",
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "config": vars(args),
+            # Uploads are unique, so hits here came from other clients
+            "server_cache": args.url and {"before": cache_before, "after": server_cache_stats(args.url)},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
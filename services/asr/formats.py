@@ -0,0 +1,110 @@
+"""Transcript response encodings and content negotiation.
+
+The default JSON body has one object per word. The columnar encodings
+send segment and word fields as parallel arrays instead, and msgpack
+additionally packs all timestamps as little-endian float32 buffers.
+"""
+from typing import Iterable
+
+import msgpack
+import numpy as np
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+COLUMNAR_JSON = "application/vnd.writers.transcript.columnar+json"
+COLUMNAR_NDJSON = "application/vnd.writers.transcript.columnar+ndjson"
+MSGPACK = "application/x-msgpack"
+
+SUPPORTED = (JSON, NDJSON, COLUMNAR_JSON, COLUMNAR_NDJSON, MSGPACK)
+STREAMING = (NDJSON, COLUMNAR_NDJSON)
+COLUMNAR = (COLUMNAR_JSON, COLUMNAR_NDJSON, MSGPACK)
+
+
+def negotiate(accept: str, stream: bool = False) -> str:
+    """Pick the response media type for an ``Accept`` header.
+
+    The supported type with the highest q-value wins; ties go to the one
+    listed first. Falls back to plain JSON. ``stream`` forces the NDJSON
+    variant of whatever layout was chosen.
+    """
+    best, best_q = JSON, -1.0
+    for part in (accept or "").split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media in SUPPORTED and q > best_q and q > 0:
+            best, best_q = media, q
+    if stream and best not in STREAMING:
+        best = COLUMNAR_NDJSON if best in COLUMNAR else NDJSON
+    return best
+
+
+def columnar_words(words: list[dict]) -> dict:
+    return {
+        "start": [w["start"] for w in words],
+        "end": [w["end"] for w in words],
+        "word": [w["word"] for w in words],
+    }
+
+
+class ColumnarBuilder:
+    """Accumulate segments straight into parallel arrays."""
+
+    def __init__(self, language: str, duration: float):
+        self.language = language
+        self.duration = duration
+        self.seg_start: list[float] = []
+        self.seg_end: list[float] = []
+        self.seg_text: list[str] = []
+        self.word_count: list[int] = []
+        self.word_start: list[float] = []
+        self.word_end: list[float] = []
+        self.word_text: list[str] = []
+
+    def add(self, segment: dict) -> None:
+        self.seg_start.append(segment["start"])
+        self.seg_end.append(segment["end"])
+        self.seg_text.append(segment["text"])
+        words = segment["words"]
+        self.word_count.append(len(words))
+        for w in words:
+            self.word_start.append(w["start"])
+            self.word_end.append(w["end"])
+            self.word_text.append(w["word"])
+
+    def extend(self, segments: Iterable[dict]) -> "ColumnarBuilder":
+        for segment in segments:
+            self.add(segment)
+        return self
+
+    def to_dict(self) -> dict:
+        """Columnar JSON body; ``word_count[i]`` words belong to segment ``i``."""
+        return {
+            "language": self.language,
+            "duration": self.duration,
+            "segments": {
+                "start": self.seg_start,
+                "end": self.seg_end,
+                "text": self.seg_text,
+                "word_count": self.word_count,
+            },
+            "words": {
+                "start": self.word_start,
+                "end": self.word_end,
+                "word": self.word_text,
+            },
+        }
+
+    def to_msgpack(self) -> bytes:
+        """Same layout as :meth:`to_dict` with timestamps as ``<f4`` byte buffers."""
+        body = self.to_dict()
+        for table in (body["segments"], body["words"]):
+            for key in ("start", "end"):
+                table[key] = np.asarray(table[key], dtype="<f4").tobytes()
+        body["segments"]["word_count"] = np.asarray(self.word_count, dtype="<u4").tobytes()
+        return msgpack.packb(body, use_bin_type=True)
@@ -0,0 +1,129 @@
+"""Bounded executor that keeps blocking Whisper work off the event loop."""
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+_ITEM, _DONE, _ERROR = "item", "done", "error"
+
+# Weight of the newest job when updating the average job duration
+_EWMA_ALPHA = 0.2
+
+
+class QueueFullError(Exception):
+    """Raised when a job is rejected because the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its consumer has gone away."""
+
+
+class InferenceExecutor:
+    """Thread pool with admission control for blocking inference jobs.
+
+    At most ``workers`` jobs run at once and at most ``max_queue`` more wait
+    for a slot; anything beyond that is rejected immediately with a
+    retry-after estimate derived from the average job duration.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 4, default_job_seconds: float = 30.0):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.queued = 0
+        self.in_flight = 0
+        self.avg_job_seconds = default_job_seconds
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a newly submitted job would be admitted."""
+        waves = math.ceil((self.queued + 1) / self.workers)
+        return max(1, math.ceil(self.avg_job_seconds * waves))
+
+    def stats(self) -> dict:
+        return {
+            "queue_length": self.queued,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "saturated": self.queued >= self.max_queue and self.in_flight >= self.workers,
+            "avg_job_seconds": round(self.avg_job_seconds, 3),
+        }
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self.queued + self.in_flight >= self.workers + self.max_queue:
+                raise QueueFullError(self.retry_after())
+            self.queued += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+
+    def _finish(self, elapsed: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.avg_job_seconds += _EWMA_ALPHA * (elapsed - self.avg_job_seconds)
+
+    def submit(self, job: Callable[[Callable[[Any], None]], None], buffer: int = 32) -> AsyncIterator:
+        """Run ``job(emit)`` on the pool and return an async iterator of emitted items.
+
+        ``emit`` blocks the worker thread while ``buffer`` items are waiting
+        to be consumed, so a slow client throttles decoding instead of
+        piling results up in memory. Exceptions raised by the job are
+        re-raised from the iterator. Must be called from the event loop;
+        raises :class:`QueueFullError` when the job is not admitted.
+        """
+        self._admit()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+        cancelled = threading.Event()
+
+        def emit(item: Any) -> None:
+            if cancelled.is_set():
+                raise JobCancelled()
+            asyncio.run_coroutine_threadsafe(queue.put((_ITEM, item)), loop).result()
+
+        def run() -> None:
+            self._start()
+            t0 = time.monotonic()
+            final = (_DONE, None)
+            try:
+                job(emit)
+            except JobCancelled:
+                logger.info("Inference job cancelled by consumer")
+                return
+            except BaseException as e:
+                final = (_ERROR, e)
+            finally:
+                self._finish(time.monotonic() - t0)
+            if not cancelled.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(final), loop)
+
+        async def results() -> AsyncIterator:
+            try:
+                while True:
+                    kind, value = await queue.get()
+                    if kind == _DONE:
+                        return
+                    if kind == _ERROR:
+                        raise value
+                    yield value
+            finally:
+                cancelled.set()
+                # Unblock a worker waiting on a full buffer so it sees the flag
+                while not queue.empty():
+                    queue.get_nowait()
+
+        self._pool.submit(run)
+        return results()
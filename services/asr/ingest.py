@@ -0,0 +1,75 @@
+"""Decode uploads straight from their file object into PCM."""
+from typing import BinaryIO
+
+import av
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Extra room on top of the container's duration estimate
+_HEADROOM_SECONDS = 1.0
+
+
+def _decoded_frames(container, stream):
+    iterator = container.decode(stream)
+    while True:
+        try:
+            yield next(iterator)
+        except StopIteration:
+            return
+        except av.error.InvalidDataError:
+            continue
+
+
+def probe_duration(fileobj: BinaryIO) -> float | None:
+    """Duration in seconds from the container header, or None if it does not say.
+
+    Only the header is read, so this is cheap even for long recordings;
+    the file object is rewound afterwards.
+    """
+    fileobj.seek(0)
+    try:
+        with av.open(fileobj, mode="r", metadata_errors="ignore") as container:
+            return container.duration / av.time_base if container.duration else None
+    finally:
+        fileobj.seek(0)
+
+
+def decode_upload(fileobj: BinaryIO, sampling_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode ``fileobj`` to mono float32 samples at ``sampling_rate``.
+
+    Produces the same samples as ``faster_whisper.decode_audio``, but each
+    resampled frame is scaled straight into one float32 array sized from
+    the container's duration instead of collecting the whole int16 stream
+    in a buffer first, so peak memory is about the PCM itself. The file
+    object is read in place (e.g. a spooled upload), never copied.
+
+    Memory still grows with the recording: the PCM is 4 bytes per sample,
+    about 230 MB per hour at 16 kHz (345 MB for 90 minutes), because the
+    model transcribes the whole array in one pass. Keeping it flat would
+    mean decoding and transcribing in bounded windows.
+    """
+    fileobj.seek(0)
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=sampling_rate)
+    with av.open(fileobj, mode="r", metadata_errors="ignore") as container:
+        stream = container.streams.audio[0]
+        duration = container.duration / av.time_base if container.duration else 0.0
+        out = np.empty(int((duration + _HEADROOM_SECONDS) * sampling_rate), dtype=np.float32)
+        n = 0
+        for frame in _decoded_frames(container, stream):
+            for resampled in resampler.resample(frame):
+                n, out = _append(out, n, resampled.to_ndarray().reshape(-1))
+        for resampled in resampler.resample(None):
+            n, out = _append(out, n, resampled.to_ndarray().reshape(-1))
+    return out[:n]
+
+
+def _append(out: np.ndarray, n: int, samples: np.ndarray) -> tuple[int, np.ndarray]:
+    end = n + samples.shape[0]
+    if end > out.shape[0]:
+        # Duration was missing or wrong; grow geometrically
+        grown = np.empty(max(end, 2 * out.shape[0]), dtype=np.float32)
+        grown[:n] = out[:n]
+        out = grown
+    np.multiply(samples, 1 / 32768.0, out=out[n:end], casting="unsafe")
+    return end, out
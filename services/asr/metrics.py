@@ -0,0 +1,55 @@
+"""Prometheus metrics for the ASR service."""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+AUDIO_SECONDS = Counter(
+    "asr_audio_seconds_total",
+    "Seconds of audio transcribed (cache hits excluded); rate() gives audio seconds per second",
+    ["model"]
+)
+REAL_TIME_FACTOR = Histogram(
+    "asr_real_time_factor",
+    "Processing time divided by audio duration per transcription",
+    ["model"],
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+)
+STAGE_SECONDS = Histogram(
+    "asr_stage_seconds",
+    "Time per transcription stage: audio_decode (container to PCM), "
+    "vad (VAD, features and language detection before the first segment), decode (Whisper generation)",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "asr_model_load_seconds",
+    "Time to load a Whisper model",
+    ["model"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+BYTES_RECEIVED = Counter("asr_request_bytes_total", "Bytes of uploaded audio received")
+QUEUE_DEPTH = Gauge("asr_queue_depth", "Jobs admitted and waiting for an inference worker")
+IN_FLIGHT = Gauge("asr_in_flight", "Jobs running on inference workers")
+CACHE_HITS = Counter("asr_transcript_cache_hits_total", "Requests answered from the transcript cache")
+
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - t0)
+
+
+def observe_transcription(model: str, audio_seconds: float, elapsed: float) -> None:
+    AUDIO_SECONDS.labels(model).inc(audio_seconds)
+    if audio_seconds > 0:
+        REAL_TIME_FACTOR.labels(model).observe(elapsed / audio_seconds)
+
+
+def track_executor(executor) -> None:
+    """Read queue depth and in-flight jobs from ``executor`` at scrape time."""
+    QUEUE_DEPTH.set_function(lambda: executor.queued)
+    IN_FLIGHT.set_function(lambda: executor.in_flight)
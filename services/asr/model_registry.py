@@ -0,0 +1,138 @@
+"""Lazily loaded, memory-budgeted set of Whisper models."""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+from faster_whisper import WhisperModel
+from faster_whisper.utils import download_model
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownModelError(Exception):
+    """Raised when a request names a model that is not configured."""
+
+
+@dataclass
+class _Entry:
+    model: Optional[WhisperModel] = None
+    size_bytes: int = 0
+    in_use: int = 0
+    load_seconds: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def _model_size_bytes(name: str) -> int:
+    """Estimate a model's footprint from its weights file on disk."""
+    path = name if os.path.isdir(name) else download_model(name)
+    try:
+        return os.path.getsize(os.path.join(path, "model.bin"))
+    except OSError:
+        return 0
+
+
+class ModelRegistry:
+    """Load Whisper models on first use and keep them under a memory budget.
+
+    Only the names in ``allowed`` can be requested. When loading a model
+    would exceed ``budget_bytes``, idle models (not used by any running
+    job) are unloaded least recently used first. Models in use are never
+    unloaded, so the budget can be exceeded briefly under load.
+    """
+
+    def __init__(
+        self,
+        allowed: list[str],
+        default: str,
+        budget_bytes: int,
+        loader: Callable[[str], WhisperModel],
+        sizer: Callable[[str], int] = _model_size_bytes
+    ):
+        if default not in allowed:
+            allowed = [default, *allowed]
+        self.allowed = allowed
+        self.default = default
+        self.budget_bytes = budget_bytes
+        self._loader = loader
+        self._sizer = sizer
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict((name, _Entry()) for name in allowed)
+        self.loads = 0
+        self.evictions = 0
+
+    def resolve(self, name: Optional[str]) -> str:
+        name = name or self.default
+        if name not in self._entries:
+            raise UnknownModelError(f"Unknown model {name!r}; available: {', '.join(self.allowed)}")
+        return name
+
+    @contextmanager
+    def acquire(self, name: Optional[str] = None) -> Iterator[WhisperModel]:
+        """Yield the loaded model ``name`` (default model if None), loading it if needed.
+
+        Blocks while the model loads, so call it from a worker thread.
+        """
+        name = self.resolve(name)
+        entry = self._entries[name]
+        with self._lock:
+            entry.in_use += 1
+            self._entries.move_to_end(name)
+        try:
+            with entry.lock:
+                if entry.model is None:
+                    self._load(name, entry)
+                model = entry.model
+            yield model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+
+    def _load(self, name: str, entry: _Entry) -> None:
+        size = self._sizer(name)
+        with self._lock:
+            self._make_room(size, keep=name)
+        t0 = time.monotonic()
+        model = self._loader(name)
+        entry.load_seconds = time.monotonic() - t0
+        with self._lock:
+            entry.model = model
+            entry.size_bytes = size
+            self.loads += 1
+        logger.info(f"Loaded model {name} in {entry.load_seconds:.1f}s ({size / 2**20:.0f} MiB)")
+
+    def _loaded_bytes(self) -> int:
+        return sum(e.size_bytes for e in self._entries.values() if e.model is not None)
+
+    def _make_room(self, needed: int, keep: str) -> None:
+        for name, entry in list(self._entries.items()):
+            if self._loaded_bytes() + needed <= self.budget_bytes:
+                return
+            if name == keep or entry.model is None or entry.in_use:
+                continue
+            logger.info(f"Unloading idle model {name} to stay within the memory budget")
+            entry.model = None
+            entry.size_bytes = 0
+            self.evictions += 1
+        if self._loaded_bytes() + needed > self.budget_bytes:
+            logger.warning(f"Loading {keep} exceeds the model memory budget; all other models are busy")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "default": self.default,
+                "available": self.allowed,
+                "loaded": {
+                    name: {"bytes": e.size_bytes, "in_use": e.in_use, "load_seconds": round(e.load_seconds, 2)}
+                    for name, e in self._entries.items()
+                    if e.model is not None
+                },
+                "loaded_bytes": self._loaded_bytes(),
+                "budget_bytes": self.budget_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
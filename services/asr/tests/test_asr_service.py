@@ -0,0 +1,146 @@
+"""Tests for the /transcribe endpoint with a fake Whisper model."""
+import io
+import json
+import os
+import tempfile
+import wave
+from contextlib import contextmanager
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("ASR_CACHE_DIR", tempfile.mkdtemp(prefix="asr-test-cache-"))
+
+import asr_service  # noqa: E402
+from inference import InferenceExecutor, QueueFullError  # noqa: E402
+from ingest import SAMPLE_RATE  # noqa: E402
+from transcript_cache import TranscriptCache  # noqa: E402
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+
+def _wav(seconds: float) -> bytes:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    samples = (np.sin(2 * np.pi * 220 * t) * 0.3 * 32767).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+class FakeModel:
+    """One segment per second of the audio it is given."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, pcm, **options):
+        self.calls += 1
+        seconds = int(pcm.shape[0] / SAMPLE_RATE)
+        segments = (
+            SimpleNamespace(start=float(i), end=i + 1.0, text=f"s{i}", words=[SimpleNamespace(start=float(i), end=i + 0.5, word="w")])
+            for i in range(seconds)
+        )
+        return segments, SimpleNamespace(language="fa", duration=pcm.shape[0] / SAMPLE_RATE)
+
+
+class FakeRegistry:
+    def __init__(self, model):
+        self.model = model
+
+    def resolve(self, name=None):
+        return name or "fake"
+
+    @contextmanager
+    def acquire(self, name=None):
+        yield self.model
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(asr_service, "registry", FakeRegistry(model))
+    monkeypatch.setattr(asr_service, "executor", InferenceExecutor(workers=1, max_queue=2))
+    monkeypatch.setattr(asr_service, "cache", None)
+    monkeypatch.setattr(asr_service, "batcher", None)
+    return model
+
+
+def _post(client, seconds=3.0, headers=NDJSON, **params):
+    files = {"file": ("a.wav", _wav(seconds), "audio/wav")}
+    r = client.post("/transcribe", files=files, headers=headers, params=params)
+    lines = [json.loads(line) for line in r.text.splitlines()] if r.status_code == 200 else []
+    return r, lines
+
+
+def test_streams_info_segments_then_done(model):
+    r, lines = _post(TestClient(asr_service.app))
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [e["type"] for e in lines] == ["info", "segment", "segment", "segment", "done"]
+    assert [e["start"] for e in lines[1:-1]] == [0.0, 1.0, 2.0]
+    assert lines[-1]["segments"] == 3
+
+
+def test_full_queue_answers_503_with_retry_after(model, monkeypatch):
+    def reject(job):
+        raise QueueFullError(7)
+
+    monkeypatch.setattr(asr_service.executor, "submit", reject)
+    r, _ = _post(TestClient(asr_service.app))
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "7"
+
+
+def test_repeated_upload_is_answered_from_cache(model, monkeypatch, tmp_path):
+    monkeypatch.setattr(asr_service, "cache", TranscriptCache(str(tmp_path), 10 ** 6))
+    client = TestClient(asr_service.app)
+    _, first = _post(client)
+    _, second = _post(client)
+    assert model.calls == 1
+    assert second == first
+    assert asr_service.cache.stats()["hits"] == 1
+
+
+def test_offset_skips_audio_and_keeps_absolute_timestamps(model):
+    _, lines = _post(TestClient(asr_service.app), seconds=3.0, offset=1.0)
+    info, segments = lines[0], lines[1:-1]
+    assert info["duration"] == pytest.approx(3.0)
+    assert [(s["start"], s["end"]) for s in segments] == [(1.0, 2.0), (2.0, 3.0)]
+    assert segments[0]["words"][0]["start"] == 1.0
+
+
+def test_batching_decodes_only_short_clips_before_admission(model, monkeypatch):
+    decoded, batched = [], []
+
+    class Batcher:
+        async def submit(self, audio, key=None):
+            batched.append(audio.shape[0])
+            return {"language": "fa", "duration": audio.shape[0] / SAMPLE_RATE, "segments": []}
+
+    def decode(fileobj):
+        decoded.append(fileobj)
+        return real_decode(fileobj)
+
+    def reject(job):
+        raise QueueFullError(3)
+
+    real_decode = asr_service._decode
+    monkeypatch.setattr(asr_service, "batcher", Batcher())
+    monkeypatch.setattr(asr_service, "ASR_BATCH_MAX_SECONDS", 2.0)
+    monkeypatch.setattr(asr_service, "_decode", decode)
+    monkeypatch.setattr(asr_service.executor, "submit", reject)
+    client = TestClient(asr_service.app)
+
+    r, _ = _post(client, seconds=5.0)
+    assert r.status_code == 503 and decoded == []
+
+    r, _ = _post(client, seconds=1.0)
+    assert r.status_code == 200 and len(decoded) == 1
+    assert batched == [SAMPLE_RATE]
@@ -0,0 +1,51 @@
+"""Tests for the cross-request micro-batcher."""
+import asyncio
+from batching import MicroBatcher
+
+
+def test_flushes_when_batch_is_full():
+    batches = []
+
+    async def run_batch(key, items):
+        batches.append(list(items))
+        return [i * 10 for i in items]
+
+    async def run():
+        batcher = MicroBatcher(run_batch, max_batch=3, max_wait_ms=10_000)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+
+    assert asyncio.run(run()) == [0, 10, 20]
+    assert batches == [[0, 1, 2]]
+
+
+def test_flushes_after_max_wait_and_groups_by_key():
+    batches = []
+
+    async def run_batch(key, items):
+        batches.append((key, list(items)))
+        return items
+
+    async def run():
+        batcher = MicroBatcher(run_batch, max_batch=8, max_wait_ms=5)
+        return await asyncio.gather(
+            batcher.submit("a", key="fa"),
+            batcher.submit("b", key="en"),
+            batcher.submit("c", key="fa"),
+        )
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+    assert sorted(batches) == [("en", ["b"]), ("fa", ["a", "c"])]
+
+
+def test_batch_error_reaches_every_caller():
+    async def run_batch(key, items):
+        raise RuntimeError("decode failed")
+
+    async def run():
+        batcher = MicroBatcher(run_batch, max_batch=2, max_wait_ms=5)
+        return await asyncio.gather(
+            batcher.submit(1), batcher.submit(2), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
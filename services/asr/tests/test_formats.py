@@ -0,0 +1,50 @@
+"""Tests for transcript encodings and content negotiation."""
+import msgpack
+import numpy as np
+import formats
+from formats import ColumnarBuilder, negotiate
+
+SEGMENTS = [
+    {"start": 0.0, "end": 1.5, "text": "سلام", "words": [
+        {"start": 0.0, "end": 0.7, "word": "سلام"},
+    ]},
+    {"start": 1.5, "end": 3.0, "text": "دنیا خوب", "words": [
+        {"start": 1.5, "end": 2.0, "word": "دنیا"},
+        {"start": 2.1, "end": 3.0, "word": "خوب"},
+    ]},
+]
+
+
+def test_negotiate_defaults_to_json():
+    assert negotiate("") == formats.JSON
+    assert negotiate("*/*") == formats.JSON
+    assert negotiate("text/html") == formats.JSON
+
+
+def test_negotiate_picks_highest_q():
+    accept = f"{formats.JSON};q=0.5, {formats.MSGPACK}, {formats.NDJSON};q=0.9"
+    assert negotiate(accept) == formats.MSGPACK
+    assert negotiate(f"{formats.MSGPACK};q=0, {formats.NDJSON}") == formats.NDJSON
+
+
+def test_stream_forces_ndjson_variant():
+    assert negotiate("", stream=True) == formats.NDJSON
+    assert negotiate(formats.COLUMNAR_JSON, stream=True) == formats.COLUMNAR_NDJSON
+    assert negotiate(formats.MSGPACK, stream=True) == formats.COLUMNAR_NDJSON
+
+
+def test_columnar_dict_layout():
+    body = ColumnarBuilder("fa", 3.0).extend(SEGMENTS).to_dict()
+    assert body["segments"]["word_count"] == [1, 2]
+    assert body["segments"]["text"] == ["سلام", "دنیا خوب"]
+    assert body["words"]["word"] == ["سلام", "دنیا", "خوب"]
+    assert body["words"]["start"] == [0.0, 1.5, 2.1]
+
+
+def test_msgpack_round_trip():
+    body = msgpack.unpackb(ColumnarBuilder("fa", 3.0).extend(SEGMENTS).to_msgpack(), raw=False)
+    assert body["language"] == "fa"
+    starts = np.frombuffer(body["words"]["start"], dtype="<f4")
+    np.testing.assert_allclose(starts, [0.0, 1.5, 2.1], rtol=1e-6)
+    assert np.frombuffer(body["segments"]["word_count"], dtype="<u4").tolist() == [1, 2]
+    assert body["words"]["word"][2] == "خوب"
@@ -0,0 +1,60 @@
+"""Tests for the bounded inference executor."""
+import asyncio
+import threading
+import pytest
+from inference import InferenceExecutor, QueueFullError
+
+
+def test_submit_yields_emitted_items():
+    async def run():
+        ex = InferenceExecutor(workers=1, max_queue=1)
+
+        def job(emit):
+            for i in range(5):
+                emit(i)
+
+        return [i async for i in ex.submit(job, buffer=2)]
+
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+
+
+def test_job_error_is_reraised():
+    async def run():
+        ex = InferenceExecutor(workers=1, max_queue=0)
+
+        def job(emit):
+            raise ValueError("boom")
+
+        async for _ in ex.submit(job):
+            pass
+
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(run())
+
+
+def test_rejects_when_queue_full():
+    release = threading.Event()
+
+    async def run():
+        ex = InferenceExecutor(workers=1, max_queue=1, default_job_seconds=10)
+
+        def job(emit):
+            release.wait(5)
+
+        first = ex.submit(job)
+        while ex.in_flight == 0:
+            await asyncio.sleep(0.001)
+        second = ex.submit(job)
+        with pytest.raises(QueueFullError) as exc:
+            ex.submit(job)
+        assert exc.value.retry_after == 20
+        assert ex.stats()["saturated"]
+        release.set()
+        for results in (first, second):
+            async for _ in results:
+                pass
+        return ex.stats()
+
+    stats = asyncio.run(run())
+    assert stats["queue_length"] == 0
+    assert stats["in_flight"] == 0
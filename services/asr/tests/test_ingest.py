@@ -0,0 +1,43 @@
+"""Tests for in-place upload decoding."""
+import io
+import wave
+import numpy as np
+import pytest
+from faster_whisper import decode_audio
+from ingest import decode_upload, probe_duration
+
+
+def _wav(seconds: float, rate: int = 22050) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 220 * t) * 0.3 * 32767).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+def test_matches_faster_whisper_decoder():
+    data = _wav(2.5)
+    ours = decode_upload(io.BytesIO(data))
+    reference = decode_audio(io.BytesIO(data))
+    assert ours.dtype == np.float32
+    assert ours.shape == reference.shape
+    assert np.array_equal(ours, reference)
+
+
+def test_reads_from_current_file_object_without_copy(tmp_path):
+    path = tmp_path / "clip.wav"
+    path.write_bytes(_wav(1.0))
+    with open(path, "rb") as f:
+        f.read(10)  # position is reset before decoding
+        audio = decode_upload(f)
+    assert abs(audio.shape[0] - 16000) <= 16
+
+
+def test_probe_duration_reads_header_and_rewinds():
+    f = io.BytesIO(_wav(2.5))
+    assert probe_duration(f) == pytest.approx(2.5, abs=0.05)
+    assert f.tell() == 0
@@ -0,0 +1,35 @@
+"""Tests for the ASR Prometheus metrics helpers."""
+from prometheus_client import REGISTRY
+import metrics
+from inference import InferenceExecutor
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_observe_transcription_counts_audio_and_rtf():
+    audio = _value("asr_audio_seconds_total", model="m")
+    count = _value("asr_real_time_factor_count", model="m")
+    metrics.observe_transcription("m", 20.0, 5.0)
+    assert _value("asr_audio_seconds_total", model="m") == audio + 20.0
+    assert _value("asr_real_time_factor_count", model="m") == count + 1
+    assert _value("asr_real_time_factor_bucket", model="m", le="0.3") >= 1
+
+
+def test_stage_records_time_even_on_error():
+    before = _value("asr_stage_seconds_count", stage="test")
+    try:
+        with metrics.stage("test"):
+            raise ValueError
+    except ValueError:
+        pass
+    assert _value("asr_stage_seconds_count", stage="test") == before + 1
+
+
+def test_gauges_follow_executor():
+    ex = InferenceExecutor(workers=1, max_queue=1)
+    metrics.track_executor(ex)
+    ex.queued, ex.in_flight = 2, 1
+    assert _value("asr_queue_depth") == 2
+    assert _value("asr_in_flight") == 1
@@ -0,0 +1,61 @@
+"""Tests for the lazy, memory-budgeted model registry."""
+import pytest
+from model_registry import ModelRegistry, UnknownModelError
+
+SIZES = {"tiny": 40, "base": 70, "large-v3": 150}
+
+
+def _registry(budget: int, loaded: list):
+    def loader(name):
+        loaded.append(name)
+        return f"model:{name}"
+
+    return ModelRegistry(
+        allowed=["tiny", "base"],
+        default="large-v3",
+        budget_bytes=budget,
+        loader=loader,
+        sizer=SIZES.__getitem__
+    )
+
+
+def test_loads_lazily_and_reuses():
+    loaded = []
+    registry = _registry(1000, loaded)
+    assert loaded == []
+    with registry.acquire("tiny") as m:
+        assert m == "model:tiny"
+    with registry.acquire("tiny"):
+        pass
+    with registry.acquire() as m:
+        assert m == "model:large-v3"
+    assert loaded == ["tiny", "large-v3"]
+
+
+def test_unknown_model_is_rejected():
+    registry = _registry(1000, [])
+    with pytest.raises(UnknownModelError):
+        registry.resolve("medium")
+
+
+def test_evicts_least_recently_used_idle_model():
+    loaded = []
+    registry = _registry(200, loaded)
+    with registry.acquire("tiny"):
+        pass
+    with registry.acquire("base"):
+        pass
+    with registry.acquire("tiny"):
+        pass
+    with registry.acquire("large-v3"):
+        pass
+    stats = registry.stats()
+    assert set(stats["loaded"]) == {"tiny", "large-v3"}
+    assert stats["evictions"] == 1
+
+
+def test_busy_models_are_not_evicted():
+    registry = _registry(100, [])
+    with registry.acquire("base"):
+        with registry.acquire("tiny"):
+            assert set(registry.stats()["loaded"]) == {"base", "tiny"}
@@ -0,0 +1,51 @@
+"""Tests for the content-addressed transcript cache."""
+import io
+import os
+from transcript_cache import TranscriptCache
+
+INFO = {"language": "fa", "duration": 1.0}
+SEGMENT = {"start": 0.0, "end": 1.0, "text": "سلام", "words": []}
+
+
+def test_key_depends_on_audio_and_params():
+    audio = io.BytesIO(b"audio-bytes")
+    key = TranscriptCache.key(audio, {"beam_size": 5})
+    assert audio.tell() == 0
+    assert key == TranscriptCache.key(io.BytesIO(b"audio-bytes"), {"beam_size": 5})
+    assert key != TranscriptCache.key(io.BytesIO(b"audio-bytes"), {"beam_size": 1})
+    assert key != TranscriptCache.key(io.BytesIO(b"other-bytes"), {"beam_size": 5})
+
+
+def test_roundtrip_and_counters(tmp_path):
+    cache = TranscriptCache(str(tmp_path), max_bytes=10_000)
+    assert cache.get("k") is None
+    cache.put("k", [INFO, SEGMENT])
+    assert list(cache.get("k")) == [INFO, SEGMENT]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = TranscriptCache(str(tmp_path), max_bytes=10_000)
+    cache.put("a", [INFO, SEGMENT])
+    entry_size = cache.stats()["bytes"]
+    cache.max_bytes = 2 * entry_size
+    cache.put("b", [INFO, SEGMENT])
+    list(cache.get("a"))  # "b" is now the oldest
+    cache.put("c", [INFO, SEGMENT])
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert not os.path.exists(tmp_path / "b.ndjson")
+
+
+def test_aborted_writes_are_not_published_and_entries_survive_restart(tmp_path):
+    cache = TranscriptCache(str(tmp_path), max_bytes=10_000)
+    writer = cache.writer("partial")
+    writer.write(INFO)
+    writer.abort()
+    cache.put("done", [INFO])
+    reopened = TranscriptCache(str(tmp_path), max_bytes=10_000)
+    assert reopened.get("partial") is None
+    assert list(reopened.get("done")) == [INFO]
+    assert sorted(os.listdir(tmp_path)) == ["done.ndjson"]
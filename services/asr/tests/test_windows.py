@@ -0,0 +1,52 @@
+"""Tests for VAD-split parallel window transcription."""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import windows
+from windows import plan_windows, transcribe_windows
+
+SR = 16000
+
+
+def _speech_every(period: int, length: int):
+    def vad(audio, options):
+        total = audio.shape[0] // SR
+        return [{"start": s * SR, "end": (s + length) * SR} for s in range(0, total - length, period)]
+    return vad
+
+
+def test_short_audio_is_one_window():
+    audio = np.zeros(5 * SR, dtype=np.float32)
+    assert plan_windows(audio, window_seconds=10) == [(0, 5 * SR)]
+
+
+def test_cuts_in_the_middle_of_silences(monkeypatch):
+    monkeypatch.setattr(windows, "get_speech_timestamps", _speech_every(4, 3))
+    audio = np.zeros(35 * SR, dtype=np.float32)
+    plan = plan_windows(audio, window_seconds=10)
+    assert plan[0][0] == 0
+    assert plan[-1][1] == audio.shape[0]
+    for (_, end), (start, _) in zip(plan, plan[1:]):
+        assert end == start
+        # every cut is at 3.5 s into a 4 s speech period, i.e. mid-silence
+        assert (end / SR) % 4 == 3.5
+
+
+def test_segments_are_shifted_and_ordered():
+    def transcribe(pcm):
+        n = pcm.shape[0] / SR
+        return "fa", [{
+            "start": 0.5,
+            "end": n,
+            "text": f"{n:.0f}s",
+            "words": [{"start": 0.5, "end": 1.0, "word": "w"}]
+        }]
+
+    audio = np.zeros(30 * SR, dtype=np.float32)
+    plan = [(0, 10 * SR), (10 * SR, 25 * SR), (25 * SR, 30 * SR)]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        language, segments = transcribe_windows(transcribe, audio, plan, pool)
+        segments = list(segments)
+    assert language == "fa"
+    assert [s["text"] for s in segments] == ["10s", "15s", "5s"]
+    assert [(s["start"], s["end"]) for s in segments] == [(0.5, 10.0), (10.5, 25.0), (25.5, 30.0)]
+    assert segments[2]["words"][0] == {"start": 25.5, "end": 26.0, "word": "w"}
@@ -0,0 +1,157 @@
+"""Content-addressed, size-bounded transcript cache on local disk."""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = ".ndjson"
+_CHUNK_SIZE = 1024 * 1024
+
+
+class TranscriptCache:
+    """LRU store of transcripts keyed by audio hash plus decode parameters.
+
+    Each entry is one NDJSON file in ``directory``: an info record followed
+    by one record per segment, the same framing as the streaming API. The
+    total size is kept under ``max_bytes`` by evicting least recently used
+    entries. Entries survive restarts when ``directory`` is on persistent
+    storage; recency is rebuilt from file mtimes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                # Left over from a write interrupted by a crash
+                os.unlink(os.path.join(self.directory, name))
+            elif name.endswith(_SUFFIX):
+                st = os.stat(os.path.join(self.directory, name))
+                found.append((st.st_mtime, name[:-len(_SUFFIX)], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    @staticmethod
+    def key(fileobj: BinaryIO, params: dict) -> str:
+        """Hash the audio bytes of ``fileobj`` and the decode ``params``.
+
+        Reads the file in chunks and rewinds it, so the upload can still be
+        decoded afterwards.
+        """
+        h = hashlib.sha256()
+        fileobj.seek(0)
+        for chunk in iter(lambda: fileobj.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+        fileobj.seek(0)
+        h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Iterator[dict]]:
+        """Return an iterator over the cached records, or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            path = self._path(key)
+        try:
+            os.utime(path)
+            f = open(path, encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"Cached transcript {key} disappeared: {e}")
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+            return None
+        return self._read(f)
+
+    @staticmethod
+    def _read(f) -> Iterator[dict]:
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    def writer(self, key: str) -> "CacheWriter":
+        return CacheWriter(self, key)
+
+    def put(self, key: str, records: list[dict]) -> None:
+        w = self.writer(key)
+        for record in records:
+            w.write(record)
+        w.commit()
+
+    def _commit(self, key: str, temp_path: str) -> None:
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, self._path(key))
+        with self._lock:
+            self._size += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            old_key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.unlink(self._path(old_key))
+            except OSError as e:
+                logger.warning(f"Failed to evict cached transcript {old_key}: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class CacheWriter:
+    """Append records to a temp file and publish it atomically on commit."""
+
+    def __init__(self, cache: TranscriptCache, key: str):
+        self._cache = cache
+        self._key = key
+        fd, self._temp_path = tempfile.mkstemp(dir=cache.directory, suffix=".tmp")
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+
+    def write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def commit(self) -> None:
+        self._file.close()
+        self._cache._commit(self._key, self._temp_path)
+
+    def abort(self) -> None:
+        self._file.close()
+        try:
+            os.unlink(self._temp_path)
+        except OSError:
+            pass
@@ -0,0 +1,90 @@
+"""Split long audio at silences and transcribe the windows concurrently."""
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from ingest import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+
+def plan_windows(
+    audio: np.ndarray,
+    window_seconds: float,
+    vad_options: Optional[VadOptions] = None,
+    sampling_rate: int = SAMPLE_RATE
+) -> list[tuple[int, int]]:
+    """Return ``(start, end)`` sample ranges of roughly ``window_seconds`` each.
+
+    Cuts are only placed in the middle of a silence found by VAD, so no
+    speech chunk is split. A speech chunk longer than the window stays whole.
+    The ranges cover the entire input.
+    """
+    max_samples = int(window_seconds * sampling_rate)
+    if audio.shape[0] <= max_samples:
+        return [(0, audio.shape[0])]
+
+    speech = get_speech_timestamps(audio, vad_options or VadOptions())
+    windows = []
+    start = 0
+    prev_end = None
+    for chunk in speech:
+        if prev_end is not None and chunk["end"] - start > max_samples:
+            cut = (prev_end + chunk["start"]) // 2
+            windows.append((start, cut))
+            start = cut
+        prev_end = chunk["end"]
+    windows.append((start, audio.shape[0]))
+    return windows
+
+
+def shift_segment(segment: dict, offset: float) -> dict:
+    """Move a segment and its words ``offset`` seconds later, in place."""
+    segment["start"] = round(segment["start"] + offset, 3)
+    segment["end"] = round(segment["end"] + offset, 3)
+    for w in segment["words"]:
+        w["start"] = round(w["start"] + offset, 3)
+        w["end"] = round(w["end"] + offset, 3)
+    return segment
+
+
+def transcribe_windows(
+    transcribe: Callable[[np.ndarray], tuple[str, list[dict]]],
+    audio: np.ndarray,
+    windows: list[tuple[int, int]],
+    pool: ThreadPoolExecutor,
+    sampling_rate: int = SAMPLE_RATE
+) -> tuple[str, Iterator[dict]]:
+    """Transcribe ``windows`` of ``audio`` on ``pool`` and stitch the results.
+
+    ``transcribe`` decodes one window and returns its language and segment
+    dicts with window-relative times. Returns the language of the first
+    window and an iterator over all segments in order, with ``start``/``end``
+    and word timestamps shifted to the full recording. Segments of a
+    window are yielded as soon as it and all earlier windows are done.
+    """
+    futures: list[Future] = [pool.submit(transcribe, audio[s:e]) for s, e in windows]
+    try:
+        language, _ = futures[0].result()
+    except BaseException:
+        for f in futures:
+            f.cancel()
+        raise
+
+    def segments() -> Iterator[dict]:
+        try:
+            for (start, _), future in zip(windows, futures):
+                _, window_segments = future.result()
+                offset = start / sampling_rate
+                for segment in window_segments:
+                    yield shift_segment(segment, offset)
+        finally:
+            # Stop queued windows when the consumer goes away early
+            for f in futures:
+                f.cancel()
+
+    logger.info(f"Transcribing {len(windows)} windows concurrently")
+    return language, segments()
@@ -0,0 +1,72 @@
+"""Cross-request micro-batching.
+
+Same MicroBatcher as services/asr/batching.py, which also holds the
+Whisper batch decoder. Each service is built from its own directory with
+no shared package between them, so the class is copied; keep the two in
+sync.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collect items submitted by concurrent requests and run them together.
+
+    A batch is flushed when ``max_batch`` items with the same key are
+    pending or ``max_wait_ms`` after the first of them arrived, whichever
+    comes first. ``run_batch`` receives the key and the list of items and
+    must return one result per item, in order.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, list], Awaitable[list]],
+        max_batch: int = 8,
+        max_wait_ms: float = 50.0
+    ):
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending: dict[Hashable, list[tuple[Any, asyncio.Future]]] = defaultdict(list)
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item: Any, key: Hashable = None) -> Any:
+        """Queue ``item`` for the next batch with ``key`` and wait for its result."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        pending = self._pending[key]
+        pending.append((item, fut))
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await fut
+
+    def _flush(self, key: Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        logger.debug(f"Running batch of {len(batch)} for key {key!r}")
+        try:
+            results = await self.run_batch(key, [item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
@@ -1,9 +1,22 @@
 import os
+import time
 import logging
-from celery import Celery
+import requests
+from celery import Celery, chain
+from celery.exceptions import Ignore
+from celery.signals import task_postrun, worker_process_init
 from .models import SessionLocal, Job
-from .storage import upload_bytes, download_to_bytes
-from .pipeline import run_pipeline
+from . import http_client
+from .llm_metrics import llm_calls
+from .storage import upload_bytes, download_to_bytes, exists
+from .checkpoint import TranscriptCheckpoint, load_segments, preview_key, transcript_key
+from .draft import MarkdownDraft
+from .job_outputs import available, mark_available
+from .pdf_cache import md_key, pdf_key, release_render
+from .pipeline import ASRStreamError, iter_asr_segments, transcribe
+from .renderers import markdown_to_pdf_bytes, summary_to_markdown, warm_up
+from .summarizer import LLMIncompleteError, summarize_map_reduce
+from .preprocess import NORMALIZED_CONTENT_TYPE, normalize_bytes, normalized_filename, normalized_key
 
 logger = logging.getLogger(__name__)
 
@@ -15,49 +28,295 @@ celery.conf.update(
     task_soft_time_limit=3300,  # 55 minutes soft limit
 )
 
+ASR_URL = os.getenv("ASR_URL", "http://asr:7000/transcribe")
 
-@celery.task(name="run_pipeline_task", queue="default", bind=True)
-def run_pipeline_task(self, job_id: str):
-    """Process audio file through ASR and NLP pipeline."""
+# Fast draft transcript from a small model, shown while the full model runs.
+# It needs its own ASR deployment (e.g. CPU-only) in ASR_PREVIEW_URL: sent to
+# ASR_URL it would compete with the final transcript for the same inference
+# slots. The preview tier is off while ASR_PREVIEW_URL or ASR_PREVIEW_MODEL is empty.
+ASR_PREVIEW_MODEL = os.getenv("ASR_PREVIEW_MODEL", "base")
+ASR_PREVIEW_URL = os.getenv("ASR_PREVIEW_URL", "")
+PREVIEW_FLUSH_SECONDS = float(os.getenv("PREVIEW_FLUSH_SECONDS", "5"))
+
+# Set on render workers so each pool process loads fonts before its first job
+RENDER_WARMUP = os.getenv("RENDER_WARMUP", "0") == "1"
+
+
+@task_postrun.connect
+def log_http_pool(task=None, **kwargs):
+    """Workers have no HTTP endpoint, so connection reuse and LLM call stats are logged after each task."""
+    logger.info(f"HTTP pool after {task.name}: {http_client.stats()}")
+    logger.info(f"LLM calls after {task.name}: {llm_calls.stats()}")
+
+
+@worker_process_init.connect
+def warm_renderer(**kwargs):
+    if not RENDER_WARMUP:
+        return
+    try:
+        warm_up()
+    except Exception as e:
+        logger.warning(f"Renderer warm-up failed: {e}")
+
+
+def prepare_audio(audio_key: str) -> str:
+    """Return the key of the normalized audio, creating it on first use.
+
+    Falls back to the original upload if it cannot be normalized.
+    """
+    key = normalized_key(audio_key)
+    if exists(key):
+        return key
+    try:
+        data = normalize_bytes(download_to_bytes(audio_key))
+    except Exception as e:
+        logger.warning(f"Could not normalize {audio_key}, using the original: {e}")
+        return audio_key
+    if data is None:
+        logger.warning(f"{audio_key} is silent after trimming, using the original")
+        return audio_key
+    upload_bytes(key, data, NORMALIZED_CONTENT_TYPE)
+    return key
+
+
+def load_asr_audio(job: Job) -> tuple[str, bytes, dict]:
+    """Key and bytes of the audio to send to ASR, plus its upload filename/content type."""
+    audio_key = prepare_audio(job.audio_key)
+    upload = {}
+    if audio_key != job.audio_key:
+        upload = {"filename": normalized_filename(job.audio_key), "content_type": NORMALIZED_CONTENT_TYPE}
+    return audio_key, download_to_bytes(audio_key), upload
+
+
+@celery.task(name="preprocess_audio_task", queue="default")
+def preprocess_audio_task(job_id: str):
+    """Normalize the uploaded audio once, then start the pipeline stages.
+
+    The stages start even if normalization fails: transcribe_task prepares
+    the audio again and records the error if it still cannot.
+    """
     db = SessionLocal()
-    job = None
-    
     try:
         job = db.get(Job, job_id)
         if not job:
             logger.error(f"Job {job_id} not found")
             return
-        
+        prepare_audio(job.audio_key)
+    except Exception as e:
+        logger.warning(f"Could not prepare audio for job {job_id}, leaving it to the ASR stage: {e}")
+    finally:
+        db.close()
+    if ASR_PREVIEW_URL and ASR_PREVIEW_MODEL:
+        preview_transcript_task.delay(job_id)
+    pipeline_chain(job_id).delay()
+
+
+@celery.task(name="preview_transcript_task", queue="preview")
+def preview_transcript_task(job_id: str):
+    """Publish a draft transcript from the preview model, flushed every few seconds.
+
+    Best effort: failures are logged and never affect the job. Stops once
+    the final transcript exists, which the status API prefers anyway.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if not job:
+            logger.error(f"Job {job_id} not found")
+            return
+        _, audio, upload = load_asr_audio(job)
+    finally:
+        db.close()
+
+    lines, published = [], False
+
+    def final_exists() -> bool:
+        return "final" in available(job_id)
+
+    def publish() -> None:
+        nonlocal published
+        upload_bytes(preview_key(job_id), "\n".join(lines).encode("utf-8"), "text/plain; charset=utf-8")
+        if not published:
+            mark_available(job_id, "preview")
+            published = True
+
+    if final_exists():
+        return
+    flushed_at = time.monotonic()
+    try:
+        for s in iter_asr_segments(audio, ASR_PREVIEW_URL, model=ASR_PREVIEW_MODEL, **upload):
+            lines.append(s["text"].strip())
+            if time.monotonic() - flushed_at >= PREVIEW_FLUSH_SECONDS:
+                if final_exists():
+                    return
+                publish()
+                flushed_at = time.monotonic()
+        if not final_exists():
+            publish()
+        logger.info(f"Preview transcript for job {job_id} ready ({len(lines)} segments)")
+    except Exception as e:
+        logger.warning(f"Preview transcript for job {job_id} failed: {e}")
+
+
+def _mark_error(job_id: str, e: Exception) -> None:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if job:
+            job.status = "error"
+            job.error = str(e)[:1000]  # Truncate long errors
+            db.commit()
+    finally:
+        db.close()
+
+
+def _retry_after(e: Exception) -> int | None:
+    """Seconds from the Retry-After header of an HTTP error response, if it has one."""
+    response = getattr(e, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return max(0, int(float(value))) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _retry_or_fail(task, job_id: str, e: Exception):
+    """Retry a stage after a transient ASR/LLM error, marking the job failed once retries run out.
+
+    A server that answered with Retry-After (e.g. a full ASR queue) is
+    retried after that long instead of the task's default delay.
+    """
+    if task.request.retries >= task.max_retries:
+        logger.exception(f"Job {job_id} failed in {task.name} after {task.request.retries} retries: {e}")
+        _mark_error(job_id, e)
+        raise e
+    countdown = _retry_after(e)
+    logger.warning(f"Job {job_id} hit a transient error in {task.name}, retrying in {countdown or task.default_retry_delay}s: {e}")
+    raise task.retry(exc=e, countdown=countdown)
+
+
+def pipeline_chain(job_id: str):
+    """ASR -> summarize, each on its own queue.
+
+    Stages hand artifacts over through object storage (transcript
+    checkpoint, markdown), so a stage only needs the job id and each
+    worker tier can be scaled and tuned separately. The PDF is not part
+    of the chain; render_pdf_task runs on its first download.
+    """
+    return chain(
+        transcribe_task.si(job_id),
+        summarize_task.si(job_id)
+    )
+
+
+@celery.task(name="run_pipeline_task", queue="default")
+def run_pipeline_task(job_id: str):
+    """Former single-task pipeline, kept so messages queued before the split still run."""
+    pipeline_chain(job_id).delay()
+
+
+@celery.task(
+    name="transcribe_task",
+    queue="asr",
+    bind=True,
+    max_retries=int(os.getenv("ASR_MAX_RETRIES", "3")),
+    default_retry_delay=30
+)
+def transcribe_task(self, job_id: str):
+    """Transcribe the job audio into its transcript checkpoint.
+
+    Segments are checkpointed while ASR streams; when ASR fails or the
+    connection drops, the task is retried and resumes from the last
+    checkpointed offset instead of decoding the whole recording again.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if not job:
+            logger.error(f"Job {job_id} not found")
+            raise Ignore()
         job.status = "processing"
         db.commit()
-        
-        # Download audio
-        audio = download_to_bytes(job.audio_key)
-        
-        # Run pipeline
-        asr_url = os.getenv("ASR_URL", "http://asr:7000/transcribe")
-        md, pdf = run_pipeline(audio_bytes=audio, asr_url=asr_url)
-        
-        # Upload outputs
-        md_key = f"jobs/{job_id}/output.md"
-        pdf_key = f"jobs/{job_id}/output.pdf"
-        upload_bytes(md_key, md.encode("utf-8"), "text/markdown")
-        upload_bytes(pdf_key, pdf, "application/pdf")
-        
-        # Update job
-        job.md_key = md_key
-        job.pdf_key = pdf_key
+
+        # Download audio (normalized artifact when available)
+        audio_key, audio, upload = load_asr_audio(job)
+        checkpoint = TranscriptCheckpoint.load(job_id, audio_key)
+        transcribe(audio, ASR_URL, checkpoint=checkpoint, **upload)
+        mark_available(job_id, "final")
+        logger.info(f"Job {job_id} transcribed ({len(checkpoint.segments)} segments)")
+    except (requests.RequestException, ASRStreamError) as e:
+        _retry_or_fail(self, job_id, e)
+    except Ignore:
+        raise
+    except Exception as e:
+        logger.exception(f"Job {job_id} failed in ASR: {e}")
+        _mark_error(job_id, e)
+        raise
+    finally:
+        db.close()
+
+
+@celery.task(
+    name="summarize_task",
+    queue="llm",
+    bind=True,
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    default_retry_delay=30
+)
+def summarize_task(self, job_id: str):
+    """Summarize the stored transcript, publish the job markdown and mark the job done.
+
+    Chunks already summarized before a retry come back from the LLM cache.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if not job:
+            logger.error(f"Job {job_id} not found")
+            return
+        segments = load_segments(job_id)
+        out = summarize_map_reduce(segments, draft=MarkdownDraft(job_id))
+        md = summary_to_markdown(out)
+        upload_bytes(md_key(job_id), md.encode("utf-8"), "text/markdown")
+
+        job.md_key = md_key(job_id)
         job.status = "done"
         db.commit()
-        
         logger.info(f"Job {job_id} completed successfully")
-        
+    except (requests.RequestException, LLMIncompleteError) as e:
+        _retry_or_fail(self, job_id, e)
     except Exception as e:
-        logger.exception(f"Job {job_id} failed: {e}")
-        if job:
-            job.status = "error"
-            job.error = str(e)[:1000]  # Truncate long errors
-            db.commit()
+        logger.exception(f"Job {job_id} failed in summarization: {e}")
+        _mark_error(job_id, e)
+        raise
+    finally:
+        db.close()
+
+
+@celery.task(name="render_pdf_task", queue="render")
+def render_pdf_task(job_id: str):
+    """Render the job markdown to PDF on first download.
+
+    Runs under the render claim taken by the API (see pdf_cache) and
+    releases it when done. A failed render leaves the job done; the next
+    download tries again.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if not job or not job.md_key:
+            logger.error(f"Job {job_id} has no markdown to render")
+            return
+        key = pdf_key(job_id)
+        if not exists(key):
+            md = download_to_bytes(job.md_key).decode("utf-8")
+            upload_bytes(key, markdown_to_pdf_bytes(md), "application/pdf")
+        job.pdf_key = key
+        db.commit()
+        logger.info(f"PDF for job {job_id} rendered")
+    except Exception as e:
+        logger.exception(f"PDF for job {job_id} failed: {e}")
         raise
     finally:
         db.close()
+        release_render(job_id)
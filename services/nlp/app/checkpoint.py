@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import logging
+from .storage import upload_bytes, download_to_bytes, exists
+
+logger = logging.getLogger(__name__)
+
+# How often (seconds) streamed segments are flushed to storage while ASR runs
+CHECKPOINT_INTERVAL = float(os.getenv("TRANSCRIPT_CHECKPOINT_SECONDS", "30"))
+
+
+def checkpoint_key(job_id: str) -> str:
+    return f"jobs/{job_id}/transcript.json"
+
+
+def transcript_key(job_id: str) -> str:
+    """Final plain-text transcript, published once ASR has finished."""
+    return f"jobs/{job_id}/transcript.txt"
+
+
+def preview_key(job_id: str) -> str:
+    """Draft transcript from the fast preview model."""
+    return f"jobs/{job_id}/transcript.preview.txt"
+
+
+def load_segments(job_id: str) -> list[dict]:
+    """Segments of a finished transcript, as handed from the ASR stage to summarization."""
+    data = json.loads(download_to_bytes(checkpoint_key(job_id)))
+    if not data.get("complete"):
+        raise RuntimeError(f"Transcript for job {job_id} is incomplete")
+    return data["segments"]
+
+
+class TranscriptCheckpoint:
+    """Segments of a job's transcript committed so far, stored in S3/MinIO.
+
+    ``offset`` is the end of the last committed segment, i.e. where ASR
+    should resume after a failure. A checkpoint made from a different
+    audio object (e.g. the raw upload instead of the normalized one) has
+    other timestamps and is discarded.
+    """
+
+    def __init__(self, job_id: str, audio_key: str, interval: float = CHECKPOINT_INTERVAL):
+        self.key = checkpoint_key(job_id)
+        self.text_key = transcript_key(job_id)
+        self.audio_key = audio_key
+        self.interval = interval
+        self.segments: list[dict] = []
+        self.complete = False
+        self._saved_at = time.monotonic()
+        self._dirty = False
+
+    @property
+    def offset(self) -> float:
+        return self.segments[-1]["end"] if self.segments else 0.0
+
+    @classmethod
+    def load(cls, job_id: str, audio_key: str) -> "TranscriptCheckpoint":
+        cp = cls(job_id, audio_key)
+        if not exists(cp.key):
+            return cp
+        data = json.loads(download_to_bytes(cp.key))
+        if data.get("audio_key") != audio_key:
+            logger.info(f"Ignoring checkpoint {cp.key} made from {data.get('audio_key')}")
+            return cp
+        cp.segments = data["segments"]
+        cp.complete = data.get("complete", False)
+        logger.info(f"Resuming from {cp.key}: {len(cp.segments)} segments, offset {cp.offset:.1f}s")
+        return cp
+
+    def add(self, segment: dict) -> None:
+        # Word timings are not needed downstream; keep the checkpoint small
+        self.segments.append({"start": segment["start"], "end": segment["end"], "text": segment["text"]})
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= self.interval:
+            self.save()
+
+    @property
+    def text(self) -> str:
+        return "\n".join(s["text"].strip() for s in self.segments)
+
+    def save(self, complete: bool = False) -> None:
+        """Store the segments; on completion also publish the plain-text transcript."""
+        if not self._dirty and complete == self.complete:
+            return
+        if complete and not self.complete:
+            upload_bytes(self.text_key, self.text.encode("utf-8"), "text/plain; charset=utf-8")
+        self.complete = complete
+        body = {"audio_key": self.audio_key, "complete": complete, "segments": self.segments}
+        upload_bytes(self.key, json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json")
+        self._saved_at = time.monotonic()
+        self._dirty = False
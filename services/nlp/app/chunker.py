@@ -1,3 +1,10 @@
+import os
+import re
+import math
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+
+
 def chunk_by_length(text: str, max_chars: int = 1800) -> list[str]:
     """Split text into chunks by paragraph, respecting max_chars limit."""
     text = text.strip()
@@ -19,3 +26,132 @@ def chunk_by_length(text: str, max_chars: int = 1800) -> list[str]:
         parts.append("\n".join(buf).strip())
     
     return parts
+
+
+# Rough characters per model token for Persian text; pass a real
+# tokenizer's counting function to chunk_segments for exact budgets
+CHARS_PER_TOKEN = float(os.getenv("CHUNK_CHARS_PER_TOKEN", "3"))
+
+# Sentence ends: Latin and Persian/Arabic punctuation
+_SENTENCE_END = re.compile(r"(?<=[.!?؟…۔])\s+")
+_TERMINAL = (".", "!", "?", "؟", "…", "۔")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: float
+    end: float
+    tokens: int
+
+
+@dataclass
+class _Unit:
+    text: str
+    start: float
+    end: float
+    tokens: int
+    sentence_end: bool
+    new_segment: bool
+
+
+def _units(segments: Iterable[dict], max_tokens: int, count: Callable[[str], int]) -> Iterator[_Unit]:
+    """Split segments into sentences, timed by their share of the segment's characters.
+
+    A sentence longer than ``max_tokens`` is split further at word boundaries.
+    """
+    for seg in segments:
+        text = seg["text"].strip()
+        if not text:
+            continue
+        start, end = float(seg["start"]), float(seg["end"])
+        per_char = (end - start) / len(text)
+        pos = 0
+        first = True
+        for sentence in _SENTENCE_END.split(text):
+            offset = text.find(sentence, pos)
+            pos = offset + len(sentence)
+            pieces = [sentence]
+            tokens = count(sentence)
+            if tokens > max_tokens:
+                words = sentence.split()
+                step = max(1, len(words) * max_tokens // tokens)
+                pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+            for i, piece in enumerate(pieces):
+                last = i == len(pieces) - 1
+                yield _Unit(
+                    text=piece,
+                    start=start + offset * per_char,
+                    end=start + min(offset + len(piece), len(text)) * per_char,
+                    tokens=tokens if len(pieces) == 1 else count(piece),
+                    sentence_end=last and sentence.endswith(_TERMINAL),
+                    new_segment=first
+                )
+                offset += len(piece) + 1
+                first = False
+
+
+def chunk_segments(
+    segments: Iterable[dict],
+    max_tokens: int = 2000,
+    overlap_tokens: int = 100,
+    pause_seconds: float = 1.5,
+    count_tokens: Callable[[str], int] = estimate_tokens
+) -> list[Chunk]:
+    """Group ASR segments (``start``, ``end``, ``text``) into chunks of at most ``max_tokens``.
+
+    Runs in linear time: tokens are counted once per sentence and kept as
+    prefix sums. Once a chunk is at least half full, it is cut at the
+    last pause of ``pause_seconds`` or more, else at the last sentence
+    end, else where the budget runs out. The next chunk repeats up to
+    ``overlap_tokens`` of context from the end of the previous one.
+    """
+    units = list(_units(segments, max_tokens, count_tokens))
+    n = len(units)
+    prefix = [0]
+    for u in units:
+        prefix.append(prefix[-1] + u.tokens)
+
+    chunks: list[Chunk] = []
+    start = 0
+    while start < n:
+        end = start + 1
+        while end < n and prefix[end + 1] - prefix[start] <= max_tokens:
+            end += 1
+        cut = end
+        if end < n:
+            lo = start + 1
+            while lo < end and prefix[lo] - prefix[start] < max_tokens // 2:
+                lo += 1
+            pause = sentence = None
+            for b in range(end, lo - 1, -1):
+                if units[b].start - units[b - 1].end >= pause_seconds:
+                    pause = b
+                    break
+                if sentence is None and units[b - 1].sentence_end:
+                    sentence = b
+            cut = pause or sentence or end
+        parts = []
+        for u in units[start:cut]:
+            if parts:
+                parts.append("\n" if u.new_segment else " ")
+            parts.append(u.text)
+        chunks.append(Chunk(
+            text="".join(parts),
+            start=round(units[start].start, 3),
+            end=round(units[cut - 1].end, 3),
+            tokens=prefix[cut] - prefix[start]
+        ))
+        if cut >= n:
+            break
+        nxt = cut
+        while nxt - 1 > start and prefix[cut] - prefix[nxt - 1] <= overlap_tokens:
+            nxt -= 1
+        if prefix[cut + 1] - prefix[nxt] > max_tokens:
+            nxt = cut  # overlap would leave no room for the next unit
+        start = nxt
+    return chunks
@@ -0,0 +1,111 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from .job_outputs import mark_available
+from .renderers import build_markdown, section_lines
+from .schemas import ChunkOut
+from .storage import upload_bytes
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between uploads of the draft while tokens stream in
+DRAFT_FLUSH_SECONDS = float(os.getenv("DRAFT_FLUSH_SECONDS", "2"))
+
+# "heading"/"summary" string values in a possibly unterminated JSON reply
+_PARTIAL_FIELD = re.compile(r'"(heading|summary)"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+
+def draft_key(job_id: str) -> str:
+    return f"jobs/{job_id}/output.draft.md"
+
+
+def _unescape(value: str) -> str:
+    try:
+        return json.loads(f'"{value}"')
+    except ValueError:
+        # Cut inside an escape sequence
+        return value.replace('\\n', "\n").replace('\\"', '"')
+
+
+def partial_lines(raw: str) -> list[str]:
+    """Headings and summaries readable so far in a chunk reply that is still streaming."""
+    lines = []
+    for field, value in _PARTIAL_FIELD.findall(raw):
+        text = _unescape(value).strip()
+        if text:
+            lines += [f"## {text}" if field == "heading" else text, ""]
+    return lines
+
+
+class MarkdownDraft:
+    """Job markdown that grows while chunk summaries stream in, stored in S3/MinIO.
+
+    Completed chunks are rendered from their parsed structure; chunks still
+    generating show the headings and summaries streamed so far. Safe to
+    update from several threads. Uploads are throttled to one per
+    ``interval`` seconds and run on the thread whose update is due; other
+    threads skip the flush instead of waiting for an upload in progress.
+    """
+
+    def __init__(self, job_id: str, interval: float = DRAFT_FLUSH_SECONDS):
+        self.job_id = job_id
+        self.key = draft_key(job_id)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._raw: list[str] = []
+        self._done: list[ChunkOut | None] = []
+        self._flushed_at: float | None = None
+        self._published = False
+
+    def start(self, chunks: int) -> None:
+        with self._lock:
+            self._raw = [""] * chunks
+            self._done = [None] * chunks
+
+    def append(self, index: int, delta: str) -> None:
+        with self._lock:
+            self._raw[index] += delta
+        self._maybe_flush()
+
+    def complete(self, index: int, out: ChunkOut) -> None:
+        with self._lock:
+            self._done[index] = out
+        self._maybe_flush()
+
+    def render(self) -> str:
+        with self._lock:
+            raw, done = list(self._raw), list(self._done)
+        title = next((d.title for d in done if d is not None and d.title.strip()), "پیش‌نویس")
+        lines = [f"# {title}", "", "_پیش‌نویس در حال تولید است…_", ""]
+        for chunk_raw, out in zip(raw, done):
+            if out is not None:
+                for section in out.sections:
+                    lines += section_lines(section)
+            else:
+                lines += partial_lines(chunk_raw)
+        return build_markdown("\n".join(lines))
+
+    def _maybe_flush(self) -> None:
+        if self._flushed_at is not None and time.monotonic() - self._flushed_at < self.interval:
+            return
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self.flush()
+        finally:
+            self._flush_lock.release()
+
+    def flush(self) -> None:
+        self._flushed_at = time.monotonic()
+        try:
+            upload_bytes(self.key, self.render().encode("utf-8"), "text/markdown")
+            if not self._published:
+                mark_available(self.job_id, "draft")
+                self._published = True
+        except RuntimeError as e:
+            # A lost draft update must not fail generation
+            logger.warning(f"Failed to upload draft {self.key}: {e}")
@@ -0,0 +1,78 @@
+import os
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Distinct hosts kept in the pool, and open connections allowed per host
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "8"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))
+# Longest Retry-After honoured in place. A busy ASR asks for as long as its
+# queue takes to drain, which can be longer than a task may run; the final
+# 503 then reaches the task, which is retried after Retry-After instead.
+HTTP_RETRY_AFTER_MAX_SECONDS = float(os.getenv("HTTP_RETRY_AFTER_MAX_SECONDS", "5"))
+
+
+class _CappedRetry(Retry):
+    def get_retry_after(self, response) -> float | None:
+        seconds = super().get_retry_after(response)
+        return None if seconds is None else min(seconds, HTTP_RETRY_AFTER_MAX_SECONDS)
+
+
+def _retry() -> Retry:
+    # ASR transcription and chat completions have no side effects, so POST
+    # is retried too. Only failures before a response body is read are
+    # retried; a stream cut halfway is left to the task-level retry.
+    return _CappedRetry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=0,
+        status=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_SECONDS,
+        backoff_jitter=HTTP_BACKOFF_SECONDS,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+def build_session() -> requests.Session:
+    """Session with keep-alive pooling, per-host connection limits and jittered retries."""
+    s = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_PER_HOST,
+        pool_block=True,
+        max_retries=_retry()
+    )
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+# Shared by ASR and LLM calls; urllib3 pools are thread-safe
+session = build_session()
+
+
+def stats(s: requests.Session = session) -> dict:
+    """Per-host request and new-connection counts; reuse is the share of requests on an existing connection."""
+    hosts = {}
+    adapter = s.get_adapter("https://")
+    pools = adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        name = f"{pool.scheme}://{pool.host}:{pool.port}"
+        requests_made, connections = pool.num_requests, pool.num_connections
+        hosts[name] = {
+            "requests": requests_made,
+            "connections": connections,
+            "reuse_ratio": round(1 - connections / requests_made, 4) if requests_made else 0.0,
+        }
+    return hosts
@@ -0,0 +1,31 @@
+import os
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
+
+_redis = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+
+
+def _key(job_id: str) -> str:
+    return f"job-outputs:{job_id}"
+
+
+def mark_available(job_id: str, name: str, client: redis.Redis = _redis) -> None:
+    """Record that the optional output ``name`` ("draft", "preview", "final") has been stored.
+
+    The status API reads these instead of probing object storage on every poll.
+    """
+    try:
+        client.hset(_key(job_id), name, 1)
+    except redis.RedisError as e:
+        logger.warning(f"Could not record {name} output for job {job_id}: {e}")
+
+
+def available(job_id: str, client: redis.Redis = _redis) -> set[str]:
+    """Names recorded by mark_available; empty if Redis cannot be reached."""
+    try:
+        return {name.decode() for name in client.hkeys(_key(job_id))}
+    except redis.RedisError as e:
+        logger.warning(f"Could not read outputs of job {job_id}: {e}")
+        return set()
@@ -0,0 +1,264 @@
+"""OpenAI-compatible front for vLLM that batches chat completions across jobs.
+
+Workers point ``VLLM_URL`` here instead of at vLLM. Chat requests with
+the same sampling parameters that arrive within ``LLM_BATCH_MAX_WAIT_MS``
+of each other are sent upstream as one ``/v1/completions`` call with one
+prompt per request; each prompt is the request's messages rendered by
+vLLM's chat template (``/tokenize``). Streaming requests are batched with
+each other the same way: the upstream stream is split back into one chat
+completion stream per request by choice index. If a merged call fails
+before it returns, its requests are retried one by one. Requests with
+``n`` other than 1 are proxied unchanged.
+
+Run with ``uvicorn app.llm_broker:app --port 8002``.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from .batching import MicroBatcher
+from .http_client import session
+
+logger = logging.getLogger(__name__)
+
+# vLLM server root (serves /tokenize and /v1/completions)
+LLM_BROKER_UPSTREAM = os.getenv("LLM_BROKER_UPSTREAM", "http://vllm:8000").rstrip("/")
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "16"))
+LLM_BATCH_MAX_WAIT_MS = float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "20"))
+
+app = FastAPI(title="LLM batching broker")
+
+_tokenize_pool = ThreadPoolExecutor(max_workers=8)
+# Reads batched upstream streams; one thread per merged call in flight
+_relay_pool = ThreadPoolExecutor(max_workers=32)
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "batches": 0, "proxied": 0, "fallbacks": 0}
+
+
+def _tokenize(model: str, messages: list[dict]) -> list[int]:
+    r = session.post(
+        f"{LLM_BROKER_UPSTREAM}/tokenize",
+        json={"model": model, "messages": messages, "add_generation_prompt": True},
+        timeout=30
+    )
+    r.raise_for_status()
+    return r.json()["tokens"]
+
+
+def _prompts(params: dict, conversations: list[list[dict]]) -> list[list[int]]:
+    return list(_tokenize_pool.map(lambda m: _tokenize(params.get("model", ""), m), conversations))
+
+
+def _usage(prompt: list[int], cached: int, total: int) -> dict:
+    # Cached prompt tokens are reported for the whole call; each reply gets
+    # a share proportional to its prompt length. Completion tokens are only
+    # reported for the whole call too.
+    return {"prompt_tokens": len(prompt), "prompt_tokens_details": {"cached_tokens": cached * len(prompt) // total}}
+
+
+def _cached_tokens(usage: dict | None) -> int:
+    return int(((usage or {}).get("prompt_tokens_details") or {}).get("cached_tokens") or 0)
+
+
+def complete_batch(params: dict, conversations: list[list[dict]]) -> list[dict]:
+    """One upstream completion call for all ``conversations``, split back into chat completion bodies."""
+    prompts = _prompts(params, conversations)
+    r = session.post(f"{LLM_BROKER_UPSTREAM}/v1/completions", json={**params, "prompt": prompts}, timeout=180)
+    r.raise_for_status()
+    data = r.json()
+    choices = sorted(data["choices"], key=lambda c: c["index"])
+    if len(choices) != len(prompts):
+        raise RuntimeError(f"Upstream returned {len(choices)} choices for {len(prompts)} prompts")
+    cached, total = _cached_tokens(data.get("usage")), sum(len(p) for p in prompts) or 1
+    return [
+        {
+            "id": f"{data.get('id', 'batch')}-{i}",
+            "object": "chat.completion",
+            "created": data.get("created", int(time.time())),
+            "model": data.get("model", params.get("model")),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": choice["text"]},
+                "finish_reason": choice.get("finish_reason"),
+            }],
+            "usage": _usage(prompt, cached, total),
+        }
+        for i, (choice, prompt) in enumerate(zip(choices, prompts))
+    ]
+
+
+def open_stream(params: dict, conversations: list[list[dict]]):
+    """Start one streaming upstream completion call for all ``conversations``; returns the response and prompts."""
+    prompts = _prompts(params, conversations)
+    body = {**params, "prompt": prompts, "stream": True, "stream_options": {"include_usage": True}}
+    r = session.post(f"{LLM_BROKER_UPSTREAM}/v1/completions", json=body, stream=True, timeout=180)
+    if r.status_code >= 400:
+        with r:
+            r.raise_for_status()
+    return r, prompts
+
+
+def _sse(event: dict) -> bytes:
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def relay_stream(r, prompts: list[list[int]], params: dict, emit: Callable[[int, bytes | None], None]) -> None:
+    """Split an upstream completion stream into one chat completion stream per prompt.
+
+    ``emit(i, data)`` receives the SSE bytes for prompt ``i`` and finally
+    ``None``. A stream cut off upstream ends without ``[DONE]``, which
+    clients treat as incomplete.
+    """
+    include_usage = bool((params.get("stream_options") or {}).get("include_usage"))
+    total = sum(len(p) for p in prompts) or 1
+    try:
+        with r:
+            for line in r.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    for i in range(len(prompts)):
+                        emit(i, b"data: [DONE]\n\n")
+                    break
+                event = json.loads(data)
+                base = {
+                    "object": "chat.completion.chunk",
+                    "created": event.get("created", int(time.time())),
+                    "model": event.get("model", params.get("model")),
+                }
+                for choice in event.get("choices") or []:
+                    i = choice["index"]
+                    emit(i, _sse({**base, "id": f"{event.get('id', 'batch')}-{i}", "choices": [{
+                        "index": 0,
+                        "delta": {"content": choice.get("text", "")},
+                        "finish_reason": choice.get("finish_reason"),
+                    }]}))
+                if event.get("usage") and include_usage:
+                    cached = _cached_tokens(event["usage"])
+                    for i, prompt in enumerate(prompts):
+                        emit(i, _sse({**base, "id": f"{event.get('id', 'batch')}-{i}", "choices": [], "usage": _usage(prompt, cached, total)}))
+    except Exception as e:
+        logger.warning(f"Batched stream of {len(prompts)} broke off: {e}")
+    finally:
+        for i in range(len(prompts)):
+            emit(i, None)
+
+
+async def _drain(queue: asyncio.Queue) -> AsyncIterator[bytes]:
+    while (data := await queue.get()) is not None:
+        yield data
+
+
+async def _run_stream_batch(params: dict, conversations: list) -> list[AsyncIterator[bytes] | Exception]:
+    try:
+        groups = [(list(range(len(conversations))), await asyncio.to_thread(open_stream, params, conversations))]
+    except Exception as e:
+        if len(conversations) == 1:
+            raise
+        logger.warning(f"Streamed batch of {len(conversations)} failed, sending each request alone: {e}")
+        with _stats_lock:
+            _stats["fallbacks"] += 1
+        opened = await asyncio.gather(
+            *(asyncio.to_thread(open_stream, params, [c]) for c in conversations), return_exceptions=True
+        )
+        groups = [([i], o) for i, o in enumerate(opened)]
+    loop = asyncio.get_running_loop()
+    queues = [asyncio.Queue() for _ in conversations]
+    replies: list[AsyncIterator[bytes] | Exception] = [_drain(q) for q in queues]
+    for members, opened in groups:
+        if isinstance(opened, Exception):
+            replies[members[0]] = opened
+            continue
+
+        def emit(i: int, data: bytes | None, members=members):
+            loop.call_soon_threadsafe(queues[members[i]].put_nowait, data)
+
+        _relay_pool.submit(relay_stream, *opened, params, emit)
+    return replies
+
+
+async def _run_batch(key: str, conversations: list) -> list[dict | AsyncIterator[bytes] | Exception]:
+    """Replies in order; when the merged call fails, each request is sent alone and may fail alone."""
+    params = json.loads(key)
+    with _stats_lock:
+        _stats["batches"] += 1
+    logger.info(f"Sending batch of {len(conversations)} chat requests upstream")
+    if params.pop("stream", False):
+        return await _run_stream_batch(params, conversations)
+    try:
+        return await asyncio.to_thread(complete_batch, params, conversations)
+    except Exception as e:
+        if len(conversations) == 1:
+            raise
+        logger.warning(f"Batch of {len(conversations)} failed, sending each request alone: {e}")
+    with _stats_lock:
+        _stats["fallbacks"] += 1
+    replies = await asyncio.gather(
+        *(asyncio.to_thread(complete_batch, params, [c]) for c in conversations), return_exceptions=True
+    )
+    return [r if isinstance(r, Exception) else r[0] for r in replies]
+
+
+batcher = MicroBatcher(_run_batch, LLM_BATCH_MAX_SIZE, LLM_BATCH_MAX_WAIT_MS)
+
+
+async def _proxy(body: dict) -> Response:
+    """Forward the request unchanged; upstream errors are returned as they are, before any streaming starts."""
+    try:
+        r = await asyncio.to_thread(
+            session.post, f"{LLM_BROKER_UPSTREAM}/v1/chat/completions", json=body, stream=True, timeout=180
+        )
+    except Exception as e:
+        logger.warning(f"Proxied completion failed: {e}")
+        raise HTTPException(status_code=502, detail=str(e)) from e
+    media_type = r.headers.get("content-type", "text/event-stream")
+    if r.status_code >= 400:
+        with r:
+            return Response(r.content, status_code=r.status_code, media_type=media_type)
+
+    def relay():
+        with r:
+            yield from r.iter_content(chunk_size=None)
+
+    return StreamingResponse(relay(), media_type=media_type)
+
+
+@app.get("/health")
+def health():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["mean_batch_size"] = round((stats["requests"] - stats["proxied"]) / stats["batches"], 2) if stats["batches"] else 0.0
+    return {"ok": True, "upstream": LLM_BROKER_UPSTREAM, **stats}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    with _stats_lock:
+        _stats["requests"] += 1
+    if body.get("n", 1) != 1:
+        with _stats_lock:
+            _stats["proxied"] += 1
+        return await _proxy(body)
+    messages = body.pop("messages", None)
+    if not messages:
+        raise HTTPException(status_code=400, detail="messages is required")
+    # Requests are only batched with others sampled (and streamed) the same way
+    key = json.dumps(body, sort_keys=True, ensure_ascii=False)
+    try:
+        reply = await batcher.submit(messages, key=key)
+        if isinstance(reply, Exception):
+            raise reply
+    except Exception as e:
+        logger.warning(f"Batched completion failed: {e}")
+        raise HTTPException(status_code=502, detail=str(e)) from e
+    if body.get("stream"):
+        return StreamingResponse(reply, media_type="text/event-stream")
+    return reply
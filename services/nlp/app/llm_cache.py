@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Shared by all workers; 0 for either limit disables the cache
+LLM_CACHE_URL = os.getenv("LLM_CACHE_URL") or os.getenv("REDIS_URL", "redis://redis:6379/0")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class LLMCache:
+    """Redis-backed cache of chat completion results keyed by the request payload.
+
+    Entries expire after ``ttl`` seconds without a hit, and the least
+    recently used ones are evicted once values exceed ``max_bytes``.
+    Redis errors are logged and treated as misses so the cache can never
+    fail a job.
+    """
+
+    def __init__(self, client: redis.Redis, ttl: int, max_bytes: int, prefix: str = "llmcache"):
+        self.r = client
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self._lru = f"{prefix}:lru"  # key -> last access time
+        self._sizes = f"{prefix}:sizes"  # key -> value bytes
+        self._bytes = f"{prefix}:bytes"
+
+    @staticmethod
+    def key(endpoint: str, payload: dict) -> str:
+        """Hash of everything that determines the completion: endpoint, model, messages, sampling."""
+        body = json.dumps({"endpoint": endpoint, **payload}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return f"{self.prefix}:entry:{key}"
+
+    def get(self, key: str) -> str | None:
+        try:
+            value = self.r.get(self._entry(key))
+            p = self.r.pipeline()
+            if value is None:
+                p.incr(f"{self.prefix}:misses")
+            else:
+                p.incr(f"{self.prefix}:hits")
+                p.expire(self._entry(key), self.ttl)
+                p.zadd(self._lru, {key: time.time()})
+            p.execute()
+        except redis.RedisError as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+        return value.decode("utf-8") if value is not None else None
+
+    def put(self, key: str, value: str) -> None:
+        data = value.encode("utf-8")
+        try:
+            old = self.r.hget(self._sizes, key)
+            p = self.r.pipeline()
+            p.set(self._entry(key), data, ex=self.ttl)
+            p.zadd(self._lru, {key: time.time()})
+            p.hset(self._sizes, key, len(data))
+            p.incrby(self._bytes, len(data) - int(old or 0))
+            p.execute()
+            self._evict()
+        except redis.RedisError as e:
+            logger.warning(f"LLM cache store failed: {e}")
+
+    def delete(self, key: str) -> None:
+        try:
+            self._drop([key], evicted=False)
+        except redis.RedisError as e:
+            logger.warning(f"LLM cache delete failed: {e}")
+
+    def _drop(self, keys: list, evicted: bool = True) -> None:
+        if not keys:
+            return
+        sizes = self.r.hmget(self._sizes, keys)
+        p = self.r.pipeline()
+        p.delete(*(self._entry(k.decode() if isinstance(k, bytes) else k) for k in keys))
+        p.zrem(self._lru, *keys)
+        p.hdel(self._sizes, *keys)
+        p.decrby(self._bytes, sum(int(s or 0) for s in sizes))
+        if evicted:
+            p.incrby(f"{self.prefix}:evictions", len(keys))
+        p.execute()
+
+    def _evict(self) -> None:
+        # Index entries whose value has already expired
+        self._drop(self.r.zrangebyscore(self._lru, "-inf", time.time() - self.ttl))
+        while int(self.r.get(self._bytes) or 0) > self.max_bytes:
+            oldest = self.r.zrange(self._lru, 0, 0)
+            if not oldest:
+                break
+            self._drop(oldest)
+
+    def stats(self) -> dict:
+        try:
+            hits, misses, evictions, size = self.r.mget(
+                f"{self.prefix}:hits", f"{self.prefix}:misses", f"{self.prefix}:evictions", self._bytes
+            )
+            entries = self.r.zcard(self._lru)
+        except redis.RedisError as e:
+            return {"error": str(e)}
+        hits, misses = int(hits or 0), int(misses or 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": int(evictions or 0),
+            "entries": entries,
+            "bytes": int(size or 0),
+            "max_bytes": self.max_bytes,
+        }
+
+
+llm_cache = (
+    LLMCache(redis.Redis.from_url(LLM_CACHE_URL), LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES)
+    if LLM_CACHE_TTL_SECONDS > 0 and LLM_CACHE_MAX_BYTES > 0 else None
+)
@@ -0,0 +1,65 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def usage_tokens(usage: dict | None) -> tuple[int, int]:
+    """Prompt and prefix-cached prompt tokens from an OpenAI-style ``usage`` object.
+
+    vLLM reports cached tokens only with ``--enable-prompt-tokens-details``.
+    """
+    usage = usage or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return int(usage.get("prompt_tokens") or 0), int(details.get("cached_tokens") or 0)
+
+
+class CallStats:
+    """Per-kind totals of LLM server calls: prompt tokens, cached tokens, latency and TTFT.
+
+    Time to first token is only known for streamed calls. Its mean is kept
+    separately for calls that did and did not hit the server's prefix
+    cache, which is what shows whether reuse lowers latency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds: dict[str, dict] = {}
+
+    def record(self, kind: str, usage: dict | None, latency: float, ttft: float | None = None) -> None:
+        prompt, cached = usage_tokens(usage)
+        ttft_text = f"{ttft:.3f}s" if ttft is not None else "n/a"
+        logger.info(f"LLM {kind} call: {prompt} prompt tokens, {cached} cached, ttft {ttft_text}, {latency:.3f}s")
+        with self._lock:
+            k = self._kinds.setdefault(kind, {
+                "calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "latency": 0.0,
+                "ttft": {"cached": [0, 0.0], "uncached": [0, 0.0]},
+            })
+            k["calls"] += 1
+            k["prompt_tokens"] += prompt
+            k["cached_tokens"] += cached
+            k["latency"] += latency
+            if ttft is not None:
+                bucket = k["ttft"]["cached" if cached else "uncached"]
+                bucket[0] += 1
+                bucket[1] += ttft
+
+    def stats(self) -> dict:
+        out = {}
+        with self._lock:
+            for kind, k in self._kinds.items():
+                out[kind] = {
+                    "calls": k["calls"],
+                    "prompt_tokens": k["prompt_tokens"],
+                    "cached_tokens": k["cached_tokens"],
+                    "cached_ratio": round(k["cached_tokens"] / k["prompt_tokens"], 4) if k["prompt_tokens"] else 0.0,
+                    "mean_latency": round(k["latency"] / k["calls"], 4),
+                    **{
+                        f"mean_ttft_{name}": round(total / n, 4) if n else None
+                        for name, (n, total) in k["ttft"].items()
+                    },
+                }
+        return out
+
+
+llm_calls = CallStats()
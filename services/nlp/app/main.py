@@ -1,20 +1,36 @@
 import os
+import time
+import asyncio
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse
 from .schemas import UploadResponse, JobStatus
 from .models import SessionLocal, Job
-from .storage import upload_bytes, presign
-from .celery_app import run_pipeline_task
+from .storage import upload_bytes, presign, exists
+from .checkpoint import preview_key, transcript_key
+from .draft import draft_key
+from .job_outputs import available
+from .pdf_cache import PDF_WAIT_SECONDS, claim_render, pdf_key
+from .llm_cache import llm_cache
+from . import http_client
+from .celery_app import preprocess_audio_task, render_pdf_task
 
 app = FastAPI(title="NLP/Orchestrator Service")
 
 # Max file size: 500MB
 MAX_FILE_SIZE = 500 * 1024 * 1024
 
+# Public address of this service, used for links back to it (e.g. the lazy PDF)
+EXTERNAL_BASE_URL = os.getenv("EXTERNAL_BASE_URL", "").rstrip("/")
+
 
 @app.get("/health")
 def health():
-    return {"ok": True}
+    return {
+        "ok": True,
+        "llm_cache": llm_cache.stats() if llm_cache is not None else None,
+        "http_pool": http_client.stats()
+    }
 
 
 @app.post("/api/upload", response_model=UploadResponse)
@@ -39,7 +55,7 @@ async def upload(file: UploadFile = File(default=...)):
         job.audio_key = key
         db.commit()
         
-        run_pipeline_task.delay(job.id)
+        preprocess_audio_task.delay(job.id)
         return UploadResponse(job_id=job.id)
     except HTTPException:
         raise
@@ -60,7 +76,25 @@ def job_status(job_id: str):
             return JSONResponse({"detail": "not found"}, status_code=404)
         
         md_url = presign(job.md_key) if job.md_key else None
-        pdf_url = presign(job.pdf_key) if job.pdf_key else None
+        pdf_url = None
+        if job.pdf_key:
+            pdf_url = presign(job.pdf_key)
+        elif job.md_key:
+            # Rendered on first download, see download_pdf
+            pdf_url = f"{EXTERNAL_BASE_URL}/api/jobs/{job.id}/pdf"
+        
+        # Recorded by the tasks as they store each output, so polls make no storage calls
+        outputs = available(job.id)
+        draft_url = None
+        if not job.md_key and "draft" in outputs:
+            draft_url = presign(draft_key(job.id))
+        
+        # The final transcript replaces the preview draft as soon as it exists
+        transcript_tier = transcript_url = None
+        for tier, key in (("final", transcript_key(job.id)), ("preview", preview_key(job.id))):
+            if tier in outputs:
+                transcript_tier, transcript_url = tier, presign(key)
+                break
         
         return JobStatus(
             job_id=job.id,
@@ -69,12 +103,53 @@ def job_status(job_id: str):
             md_key=job.md_key,
             pdf_key=job.pdf_key,
             md_url=md_url,
-            pdf_url=pdf_url
+            pdf_url=pdf_url,
+            transcript_tier=transcript_tier,
+            transcript_url=transcript_url,
+            draft_url=draft_url
         )
     finally:
         db.close()
 
 
+def _pdf_unavailable(job_id: str) -> JSONResponse | None:
+    """Error response when the job has no markdown to render, else None."""
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if not job:
+            return JSONResponse({"detail": "not found"}, status_code=404)
+        if not job.md_key:
+            return JSONResponse({"detail": "job has no output yet"}, status_code=409)
+        return None
+    finally:
+        db.close()
+
+
+@app.get("/api/jobs/{job_id}/pdf")
+async def download_pdf(job_id: str):
+    """Redirect to the job PDF, rendering it on the first request.
+
+    Concurrent first requests share one render: only the caller that
+    claims it enqueues render_pdf_task, and all of them wait for the
+    stored PDF without holding a worker thread. If it is not ready in
+    time the client gets 202 and retries.
+    """
+    error = await run_in_threadpool(_pdf_unavailable, job_id)
+    if error is not None:
+        return error
+
+    key = pdf_key(job_id)
+    if not await run_in_threadpool(exists, key):
+        if await run_in_threadpool(claim_render, job_id):
+            await run_in_threadpool(render_pdf_task.delay, job_id)
+        deadline = time.monotonic() + PDF_WAIT_SECONDS
+        while not await run_in_threadpool(exists, key):
+            if time.monotonic() >= deadline:
+                return JSONResponse({"status": "rendering"}, status_code=202, headers={"Retry-After": "5"})
+            await asyncio.sleep(0.5)
+    return RedirectResponse(presign(key), status_code=307)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="127.0.0.1", port=8001, reload=False)
@@ -0,0 +1,38 @@
+import os
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
+
+# A render that has not released its claim after this long is presumed dead
+PDF_RENDER_LOCK_SECONDS = int(os.getenv("PDF_RENDER_LOCK_SECONDS", "300"))
+# How long a download request waits on the render before asking the client to retry
+PDF_WAIT_SECONDS = float(os.getenv("PDF_WAIT_SECONDS", "20"))
+
+_redis = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+
+
+def md_key(job_id: str) -> str:
+    return f"jobs/{job_id}/output.md"
+
+
+def pdf_key(job_id: str) -> str:
+    """PDF rendered on first download and reused afterwards."""
+    return f"jobs/{job_id}/output.pdf"
+
+
+def _lock_key(job_id: str) -> str:
+    return f"pdf-render:{job_id}"
+
+
+def claim_render(job_id: str, client: redis.Redis = _redis) -> bool:
+    """True for exactly one caller until the render is released or the claim expires."""
+    return bool(client.set(_lock_key(job_id), 1, nx=True, ex=PDF_RENDER_LOCK_SECONDS))
+
+
+def release_render(job_id: str, client: redis.Redis = _redis) -> None:
+    try:
+        client.delete(_lock_key(job_id))
+    except redis.RedisError as e:
+        # The claim expires on its own
+        logger.warning(f"Could not release PDF render claim for job {job_id}: {e}")
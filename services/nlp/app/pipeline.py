@@ -1,18 +1,82 @@
-import io, requests
-from .chunker import chunk_by_length
-from .summarizer import summarize
-from .renderers import build_markdown, markdown_to_pdf_bytes
-
-def run_pipeline(audio_bytes: bytes, asr_url: str) -> (str, bytes):
-    # 1) ASR
-    files = {"file": ("audio.m4a", io.BytesIO(audio_bytes), "audio/mp4")}
-    r = requests.post(asr_url, files=files, timeout=600)
-    r.raise_for_status()
-    data = r.json()
-    txt = "\n".join([s["text"].strip() for s in data.get("segments",[])])
-    # 2) Chunk + Summarize (ساده: همهٔ متن یکجا)
-    # اگر خواستی: برای هر chunk خلاصهٔ جدا تولید کن و merge کن.
-    out = summarize(txt)
-    md = build_markdown(out["raw"])
-    pdf = markdown_to_pdf_bytes(md)
-    return md, pdf
+import io, json
+from typing import Iterator
+from .checkpoint import TranscriptCheckpoint
+from .http_client import session
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+COLUMNAR_NDJSON_MEDIA_TYPE = "application/vnd.writers.transcript.columnar+ndjson"
+# Columnar lines carry each segment's words as parallel arrays, so a long
+# transcript is parsed without building one dict per word.
+ASR_ACCEPT = f"{COLUMNAR_NDJSON_MEDIA_TYPE}, {NDJSON_MEDIA_TYPE};q=0.9, application/json;q=0.5"
+
+
+class ASRStreamError(RuntimeError):
+    """The ASR stream reported an error or ended early; the job can resume."""
+
+
+def iter_asr_segments(
+    audio_bytes: bytes,
+    asr_url: str,
+    filename: str = "audio.m4a",
+    content_type: str = "audio/mp4",
+    offset: float = 0.0,
+    model: str | None = None
+) -> Iterator[dict]:
+    """Stream segments from the ASR service as they are decoded.
+
+    Prefers the columnar stream, where ``words`` is ``{"start": [...],
+    "end": [...], "word": [...]}``; older services send a list of word dicts.
+    With ``offset`` ASR skips the audio before it (resuming a checkpoint);
+    ``model`` picks one of the ASR service's configured models.
+    """
+    files = {"file": (filename, io.BytesIO(audio_bytes), content_type)}
+    headers = {"Accept": ASR_ACCEPT}
+    params = {k: v for k, v in (("offset", offset), ("model", model)) if v}
+    with session.post(asr_url, files=files, headers=headers, params=params, stream=True, timeout=600) as r:
+        r.raise_for_status()
+        content_type = r.headers.get("content-type", "")
+        if NDJSON_MEDIA_TYPE not in content_type and COLUMNAR_NDJSON_MEDIA_TYPE not in content_type:
+            # ASR without streaming support: fall back to the buffered body
+            yield from r.json().get("segments", [])
+            return
+        done = False
+        for line in r.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            kind = event.get("type")
+            if kind == "segment":
+                yield event
+            elif kind == "error":
+                raise ASRStreamError(f"ASR failed mid-stream: {event.get('detail')}")
+            elif kind == "done":
+                done = True
+        if not done:
+            raise ASRStreamError("ASR stream ended before completion")
+
+
+def transcribe(
+    audio_bytes: bytes,
+    asr_url: str,
+    filename: str = "audio.m4a",
+    content_type: str = "audio/mp4",
+    checkpoint: TranscriptCheckpoint | None = None
+) -> list[dict]:
+    """Transcribe via ASR into ``start``/``end``/``text`` segments.
+
+    With a checkpoint, resume it and save progress as segments arrive.
+    """
+    if checkpoint is None:
+        segments = iter_asr_segments(audio_bytes, asr_url, filename, content_type)
+        return [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in segments]
+    if not checkpoint.complete:
+        try:
+            for s in iter_asr_segments(audio_bytes, asr_url, filename, content_type, checkpoint.offset):
+                checkpoint.add(s)
+        except BaseException:
+            # Keep whatever was decoded so a retry continues from there
+            checkpoint.save()
+            raise
+        checkpoint.save(complete=True)
+    return checkpoint.segments
+
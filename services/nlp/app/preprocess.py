@@ -0,0 +1,137 @@
+"""Normalize uploaded audio once: 16 kHz mono, edge silence trimmed, FLAC."""
+import io
+import os
+import posixpath
+import logging
+from typing import BinaryIO
+
+import av
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+NORMALIZED_SUFFIX = ".norm.flac"
+NORMALIZED_CONTENT_TYPE = "audio/flac"
+
+# Frames quieter than this (RMS, dBFS) count as silence
+SILENCE_DB = float(os.getenv("AUDIO_SILENCE_DB", "-45"))
+# Silence kept around the speech so first/last words are not clipped
+SILENCE_PAD_MS = int(os.getenv("AUDIO_SILENCE_PAD_MS", "300"))
+_FRAME = SAMPLE_RATE * 30 // 1000
+
+
+def normalized_key(audio_key: str) -> str:
+    """Key of the normalized artifact stored next to ``audio_key``."""
+    return audio_key + NORMALIZED_SUFFIX
+
+
+def normalized_filename(audio_key: str) -> str:
+    return posixpath.basename(normalized_key(audio_key))
+
+
+def _decoded_frames(container, stream):
+    iterator = container.decode(stream)
+    while True:
+        try:
+            yield next(iterator)
+        except StopIteration:
+            return
+        except av.error.InvalidDataError:
+            continue
+
+
+def _pcm_chunks(src: BinaryIO):
+    """Yield int16 mono chunks at ``SAMPLE_RATE`` while decoding ``src``."""
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+    with av.open(src, mode="r", metadata_errors="ignore") as container:
+        stream = container.streams.audio[0]
+        for frame in _decoded_frames(container, stream):
+            for resampled in resampler.resample(frame):
+                yield resampled.to_ndarray().reshape(-1)
+        for resampled in resampler.resample(None):
+            yield resampled.to_ndarray().reshape(-1)
+
+
+def _loud(frames: np.ndarray) -> np.ndarray:
+    """Per-row mask of frames whose RMS is above ``SILENCE_DB``."""
+    power = np.mean(np.square(frames, dtype=np.float64), axis=1) / 32768.0 ** 2
+    return power > 10 ** (SILENCE_DB / 10)
+
+
+class _Encoder:
+    def __init__(self, dst: BinaryIO):
+        self.container = av.open(dst, mode="w", format="flac")
+        self.stream = self.container.add_stream("flac", rate=SAMPLE_RATE, layout="mono")
+        self.samples = 0
+
+    def write(self, pcm: np.ndarray) -> None:
+        if not pcm.shape[0]:
+            return
+        frame = av.AudioFrame.from_ndarray(pcm.reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = SAMPLE_RATE
+        frame.pts = self.samples
+        self.samples += pcm.shape[0]
+        for packet in self.stream.encode(frame):
+            self.container.mux(packet)
+
+    def close(self) -> None:
+        for packet in self.stream.encode(None):
+            self.container.mux(packet)
+        self.container.close()
+
+
+def normalize_audio(src: BinaryIO, dst: BinaryIO) -> float:
+    """Write ``src`` to ``dst`` as 16 kHz mono FLAC without edge silence.
+
+    Audio is decoded, classified in 30 ms frames and encoded as it goes;
+    only a run of silence is held back until it is known whether speech
+    follows it. Returns the seconds written, 0.0 if no frame was above
+    the silence threshold (``dst`` then holds nothing useful).
+    """
+    pad = max(1, SILENCE_PAD_MS * SAMPLE_RATE // 1000 // _FRAME)
+    encoder = _Encoder(dst)
+    held: list[np.ndarray] = []  # silent frames since the last loud one
+    rest = np.empty(0, dtype=np.int16)
+    started = False
+
+    def feed(frames: np.ndarray) -> None:
+        nonlocal held, started
+        out = []
+        for frame, loud in zip(frames, _loud(frames)):
+            if not loud:
+                held.append(frame)
+                if not started and len(held) > pad:
+                    held.pop(0)
+                continue
+            out.extend(held)
+            out.append(frame)
+            held = []
+            started = True
+        if out:
+            encoder.write(np.concatenate(out))
+
+    try:
+        for chunk in _pcm_chunks(src):
+            pcm = np.concatenate([rest, chunk])
+            n = pcm.shape[0] // _FRAME * _FRAME
+            rest = pcm[n:]
+            if n:
+                feed(pcm[:n].reshape(-1, _FRAME))
+        if rest.shape[0]:
+            feed(np.pad(rest, (0, _FRAME - rest.shape[0])).reshape(1, _FRAME))
+        if started and held:
+            encoder.write(np.concatenate(held[:pad]))
+    finally:
+        encoder.close()
+    return encoder.samples / SAMPLE_RATE if started else 0.0
+
+
+def normalize_bytes(data: bytes) -> bytes | None:
+    """Normalize an uploaded file held in memory; None if it is all silence."""
+    out = io.BytesIO()
+    seconds = normalize_audio(io.BytesIO(data), out)
+    if not seconds:
+        return None
+    logger.info(f"Normalized audio: {len(data)} -> {out.tell()} bytes, {seconds:.1f}s kept")
+    return out.getvalue()
@@ -1,6 +1,10 @@
-from markdown import markdown as md_to_html
-from weasyprint import HTML, default_url_fetcher
+import threading
+from functools import lru_cache
+from markdown import Markdown
+from weasyprint import CSS, HTML, default_url_fetcher
+from weasyprint.text.fonts import FontConfiguration
 from urllib.parse import urlparse
+from .schemas import Section, SummarizeOut
 
 # RTL CSS for Persian/Arabic content
 RTL_CSS = """
@@ -28,14 +32,63 @@ def build_markdown(structured_text: str) -> str:
     return structured_text.rstrip() + "\n"
 
 
+def section_lines(section: Section) -> list[str]:
+    lines = [f"## {section.heading}", "", section.summary.strip(), ""]
+    if section.key_points:
+        lines += ["**نکات طلایی**", ""] + [f"- {p}" for p in section.key_points] + [""]
+    if section.traps:
+        lines += ["**دام‌های تستی**", ""] + [f"- {t}" for t in section.traps] + [""]
+    return lines
+
+
+def summary_to_markdown(out: SummarizeOut) -> str:
+    """Render a structured summary as Persian markdown."""
+    lines = [f"# {out.title}", ""]
+    for section in out.sections:
+        lines += section_lines(section)
+    if out.mcqs:
+        lines += ["## سوالات چهارگزینه‌ای", ""]
+        for i, q in enumerate(out.mcqs, 1):
+            lines += [f"{i}. {q.stem}", ""] + [f"   - {o}" for o in q.options] + [""]
+            lines += [f"   **پاسخ:** {q.answer}", "", f"   **منطق پاسخ:** {q.rationale}", ""]
+    if out.night_before.strip():
+        lines += ["## خلاصه شب امتحان", "", out.night_before.strip(), ""]
+    return build_markdown("\n".join(lines))
+
+
+# Parsed once per process and reused by every render in it; the render
+# workers are long-lived, so font discovery and CSS parsing are paid once.
+_local = threading.local()
+
+
+@lru_cache(maxsize=1)
+def _font_config() -> FontConfiguration:
+    return FontConfiguration()
+
+
+@lru_cache(maxsize=1)
+def _stylesheet() -> CSS:
+    return CSS(string=RTL_CSS, font_config=_font_config())
+
+
+def markdown_to_html(md_text: str) -> str:
+    """Convert markdown with this thread's reusable converter (``Markdown`` is not thread-safe)."""
+    converter = getattr(_local, "markdown", None)
+    if converter is None:
+        converter = _local.markdown = Markdown(output_format="xhtml")
+    return converter.reset().convert(md_text)
+
+
 def markdown_to_pdf_bytes(md_text: str) -> bytes:
     """Convert markdown to PDF with RTL support and SSRF protection."""
-    html = md_to_html(md_text, output_format="xhtml")
-    # Inject RTL CSS
-    html_with_style = f"<style>{RTL_CSS}</style>{html}"
     pdf_bytes = HTML(
-        string=html_with_style,
+        string=markdown_to_html(md_text),
         base_url="about:blank",
         url_fetcher=_safe_url_fetcher
-    ).write_pdf()
+    ).write_pdf(stylesheets=[_stylesheet()], font_config=_font_config())
     return pdf_bytes
+
+
+def warm_up() -> None:
+    """Load fonts, the stylesheet and the converter ahead of the first job."""
+    markdown_to_pdf_bytes("# گرم‌کردن\n\nمتن")
@@ -12,6 +12,11 @@ class JobStatus(BaseModel):
     pdf_key: Optional[str] = None
     md_url: Optional[str] = None
     pdf_url: Optional[str] = None
+    # "preview" while only the fast draft exists, "final" once ASR is done
+    transcript_tier: Optional[str] = None
+    transcript_url: Optional[str] = None
+    # Markdown streamed so far, until the final md_url is available
+    draft_url: Optional[str] = None
 
 class SummarizeIn(BaseModel):
     text: str
@@ -35,3 +40,14 @@ class SummarizeOut(BaseModel):
     sections: list[Section]
     mcqs: list[MCQ]
     night_before: str
+
+# Partial outputs generated separately and assembled into SummarizeOut
+class ChunkOut(BaseModel):
+    title: str
+    sections: list[Section]
+
+class MCQSet(BaseModel):
+    mcqs: list[MCQ]
+
+class NightBefore(BaseModel):
+    night_before: str
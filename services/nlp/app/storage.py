@@ -43,3 +43,14 @@ def download_to_bytes(key: str) -> bytes:
         return obj["Body"].read()
     except botocore.exceptions.ClientError as e:
         raise RuntimeError(f"Failed to download {key} from S3: {e}") from e
+
+
+def exists(key: str) -> bool:
+    """Check whether an object exists in S3/MinIO storage."""
+    try:
+        s3.head_object(Bucket=BUCKET, Key=key)
+        return True
+    except botocore.exceptions.ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise RuntimeError(f"Failed to check {key} in S3: {e}") from e
@@ -1,72 +1,247 @@
 import os
-import requests
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from pydantic import BaseModel, ValidationError
+from .chunker import chunk_segments
+from .http_client import session
+from .llm_cache import llm_cache
+from .llm_metrics import llm_calls
+from .schemas import ChunkOut, MCQSet, NightBefore, Section, SummarizeOut
+
+logger = logging.getLogger(__name__)
 
 LOCAL_MODEL = os.getenv("LOCAL_MODEL", "local-model")
 VLLM_URL_DEFAULT = os.getenv("VLLM_URL", "http://vllm:8000/v1")
 
+# Map-reduce: transcript chunk budget (tokens), context repeated between
+# chunks, and how many chunks are summarized at once
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "2000"))
+SUMMARY_CHUNK_OVERLAP = int(os.getenv("SUMMARY_CHUNK_OVERLAP", "100"))
+SUMMARY_PARALLELISM = int(os.getenv("SUMMARY_PARALLELISM", "4"))
+MAX_MCQS = 10
+# Ask the server to constrain replies to the expected JSON schema (vLLM
+# guided decoding / OpenAI structured outputs); off for servers without it
+SUMMARY_GUIDED_JSON = os.getenv("SUMMARY_GUIDED_JSON", "1") == "1"
+# Stream chunk replies into the job draft token by token; off, the draft
+# is updated per finished chunk. llm_broker batches either kind of call.
+SUMMARY_STREAM_CHUNKS = os.getenv("SUMMARY_STREAM_CHUNKS", "1") == "1"
+
+# Shared by every call; the output layout is given by each task's instructions
 SYSTEM_PROMPT = """تو یک دستیار متخصص خلاصه‌سازی در حوزهٔ پزشکی هستی.
 خروجی کاملاً فارسی باشد و کلمات انگلیسی فقط در پرانتز بیایند.
-ساختار خروجی:
+دقیقاً با ساختاری که در دستور کار آمده پاسخ بده.
+"""
+
+# Task instructions are fixed text; everything that varies per call (chunk
+# position, counts, the transcript) goes after them, see _to_messages.
+TEXT_PROMPT = """متن زیر را به این قالب تبدیل کن:
 - عنوان جلسه
 - سرفصل‌ها: هر سرفصل شامل خلاصه، نکات طلایی و دام‌های تستی
 - در انتها: ۳ تا ۱۰ سوال چهارگزینه‌ای با کلید و "منطق پاسخ"
 - یک بخش "خلاصه شب امتحان" موجز و خطی
 """
 
+CHUNK_PROMPT = """متن زیر بخشی از یک جلسه است.
+فقط یک شیء JSON معتبر (بدون توضیح اضافه) با این ساختار برگردان:
+{"title": "...", "sections": [{"heading": "...", "summary": "...", "key_points": ["..."], "traps": ["..."]}]}
+"""
+
+MCQ_PROMPT = """از سرفصل‌های زیر به تعداد خواسته‌شده سوال چهارگزینه‌ای بساز.
+فقط یک شیء JSON معتبر (بدون توضیح اضافه) با این ساختار برگردان:
+{"mcqs": [{"stem": "...", "options": ["...", "...", "...", "..."], "answer": "...", "rationale": "..."}]}
+"""
+
+NIGHT_BEFORE_PROMPT = """از سرفصل‌های زیر "خلاصه شب امتحان" موجز و خطی بنویس.
+فقط یک شیء JSON معتبر (بدون توضیح اضافه) با این ساختار برگردان:
+{"night_before": "..."}
+"""
+
 # ruff: noqa: RUF001
-def _to_messages(text: str) -> list[dict[str, str]]:
+def _to_messages(text: str, instructions: str = TEXT_PROMPT, header: str = "") -> list[dict[str, str]]:
+    """Messages laid out for the server's prefix cache.
+
+    The system prompt is identical in every call and the instructions in
+    every call of a task, so those tokens form a shared prefix whose KV
+    cache vLLM can reuse; only ``header`` and ``text`` at the end differ.
+    """
+    tail = f"{header}\n{text}" if header else text
     return [
         {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": f"متن زیر را به قالب خواسته‌شده تبدیل کن:\n{text}"}
+        {"role": "user", "content": f"{instructions}\n{tail}"}
     ]
 
-def call_local(text: str) -> dict:
+def _chunk_messages(text: str, index: int, total: int) -> list[dict[str, str]]:
+    return _to_messages(text, CHUNK_PROMPT, f"بخش {index} از {total}:")
+
+def _outline(sections: list[Section]) -> str:
+    """Compact text of the merged sections, the input of the MCQ and night-before calls."""
+    lines = []
+    for section in sections:
+        lines += [f"## {section.heading}", section.summary.strip()] + [f"- {p}" for p in section.key_points]
+    return "\n".join(lines)
+
+def _response_format(schema: type[BaseModel] | None) -> dict:
+    if schema is None or not SUMMARY_GUIDED_JSON:
+        return {}
+    return {"response_format": {
+        "type": "json_schema",
+        "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema()}
+    }}
+
+def _kind(schema: type[BaseModel] | None) -> str:
+    return schema.__name__ if schema is not None else "text"
+
+OnDelta = Callable[[str], None]
+
+class LLMIncompleteError(RuntimeError):
+    """The completion was cut off (stream ended early or a non-"stop" finish); it is not cached and can be retried."""
+
+def _check_finish(label: str, finish_reason: str | None) -> None:
+    if finish_reason != "stop":
+        raise LLMIncompleteError(f"{label} completion ended with finish_reason={finish_reason!r}")
+
+def _stream_chat(
+    url: str, payload: dict, headers: dict | None, label: str, on_delta: OnDelta
+) -> tuple[str, dict | None, float | None]:
+    """POST a streaming chat completion, passing each content delta to ``on_delta``.
+
+    Returns the text, the ``usage`` sent in the last event and the time
+    to the first content token. Raises LLMIncompleteError unless the stream
+    reached ``[DONE]`` after a "stop" finish.
+    """
+    parts, usage, ttft, finish_reason, done = [], None, None, None, False
+    t0 = time.monotonic()
+    body = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+    with session.post(url, headers=headers, json=body, stream=True, timeout=180) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                done = True
+                break
+            try:
+                event = json.loads(data)
+                usage = event.get("usage") or usage
+                if not event["choices"]:
+                    # Final usage-only event
+                    continue
+                choice = event["choices"][0]
+            except (KeyError, IndexError, ValueError) as e:
+                raise RuntimeError(
+                    f"Malformed {label} stream event: {data[:500]!r}"
+                ) from e
+            finish_reason = choice.get("finish_reason") or finish_reason
+            delta = (choice.get("delta") or {}).get("content")
+            if delta:
+                if ttft is None:
+                    ttft = time.monotonic() - t0
+                parts.append(delta)
+                on_delta(delta)
+    if not done:
+        raise LLMIncompleteError(f"{label} stream ended before [DONE]")
+    _check_finish(label, finish_reason)
+    return "".join(parts), usage, ttft
+
+def _post_chat(
+    url: str,
+    payload: dict,
+    headers: dict | None = None,
+    label: str = "local",
+    on_delta: OnDelta | None = None,
+    schema: type[BaseModel] | None = None
+) -> dict:
+    """POST a chat completion, answering from the LLM cache when the same request was made before.
+
+    With ``on_delta`` the completion is streamed and every piece of text is
+    passed to it as it arrives (a cache hit arrives as one piece). With a
+    ``schema`` the reply is validated (see ``parse_json``) and returned
+    under ``"parsed"``; only valid replies are cached, and a cached reply
+    that no longer validates is dropped and requested again. Calls that
+    reach the server are recorded in ``llm_calls`` under ``_kind(schema)``.
+    """
+    key = llm_cache.key(url, payload) if llm_cache is not None else None
+    if key is not None:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            try:
+                parsed = parse_json(cached, schema) if schema is not None else None
+            except RuntimeError as e:
+                logger.warning(f"Dropping invalid cached {label} reply: {e}")
+                llm_cache.delete(key)
+            else:
+                if on_delta is not None:
+                    on_delta(cached)
+                return {"raw": cached, "parsed": parsed}
+    t0 = time.monotonic()
+    if on_delta is not None:
+        content, usage, ttft = _stream_chat(url, payload, headers, label, on_delta)
+    else:
+        r = session.post(url, headers=headers, json=payload, timeout=180)
+        r.raise_for_status()
+        try:
+            data = r.json()
+            choice = data["choices"][0]
+            content = choice["message"]["content"]
+        except (KeyError, IndexError, ValueError) as e:
+            raise RuntimeError(
+                f"Malformed {label} response: {r.text[:500]}"
+            ) from e
+        _check_finish(label, choice.get("finish_reason"))
+        usage, ttft = data.get("usage"), None
+    llm_calls.record(_kind(schema), usage, time.monotonic() - t0, ttft)
+    parsed = parse_json(content, schema) if schema is not None else None
+    if key is not None:
+        llm_cache.put(key, content)
+    return {"raw": content, "parsed": parsed}
+
+def call_local(
+    text: str,
+    messages: list[dict[str, str]] | None = None,
+    on_delta: OnDelta | None = None,
+    schema: type[BaseModel] | None = None
+) -> dict:
     vllm_url = os.getenv("VLLM_URL", VLLM_URL_DEFAULT)
     payload = {
         "model": LOCAL_MODEL,
-        "messages": _to_messages(text),
+        "messages": messages or _to_messages(text),
         "temperature": 0.2,
-        "max_tokens": 2048
+        "max_tokens": 2048,
+        **_response_format(schema)
     }
-    r = requests.post(f"{vllm_url}/chat/completions", json=payload, timeout=180)
-    r.raise_for_status()
-    try:
-        data = r.json()
-        content = data["choices"][0]["message"]["content"]
-    except (KeyError, IndexError, ValueError) as e:
-        raise RuntimeError(
-            f"Malformed local response: {r.text[:500]}"
-        ) from e
-    return {"raw": content}
-
-def call_openai(text: str) -> dict:
+    return _post_chat(f"{vllm_url}/chat/completions", payload, label="local", on_delta=on_delta, schema=schema)
+
+def call_openai(
+    text: str,
+    messages: list[dict[str, str]] | None = None,
+    on_delta: OnDelta | None = None,
+    schema: type[BaseModel] | None = None
+) -> dict:
     api_key = os.getenv("OPENAI_API_KEY", "")
     if not api_key:
         raise ValueError("OPENAI_API_KEY is required for OpenAI backend")
     headers = {"Authorization": f"Bearer {api_key}"}
     payload = {
         "model": "gpt-4.1-mini",
-        "messages": _to_messages(text),
+        "messages": messages or _to_messages(text),
         "temperature": 0.2,
-        "max_tokens": 2048
+        "max_tokens": 2048,
+        **_response_format(schema)
     }
-    r = requests.post(
-        "https://api.openai.com/v1/chat/completions",
-        headers=headers,
-        json=payload,
-        timeout=180
+    return _post_chat(
+        "https://api.openai.com/v1/chat/completions", payload, headers, label="OpenAI", on_delta=on_delta, schema=schema
     )
-    r.raise_for_status()
-    try:
-        data = r.json()
-        content = data["choices"][0]["message"]["content"]
-    except (KeyError, IndexError, ValueError) as e:
-        raise RuntimeError(
-            f"Malformed OpenAI response: {r.text[:500]}"
-        ) from e
-    return {"raw": content}
-
-def summarize(text: str) -> dict:
+
+def summarize(
+    text: str,
+    messages: list[dict[str, str]] | None = None,
+    on_delta: OnDelta | None = None,
+    schema: type[BaseModel] | None = None
+) -> dict:
     """Summarize text using configured backend (local or openai).
     
     Note: For medical data, ensure proper anonymization before calling.
@@ -75,5 +250,81 @@ def summarize(text: str) -> dict:
     api_key = os.getenv("OPENAI_API_KEY", "")
     
     if backend == "openai" and api_key:
-        return call_openai(text)
-    return call_local(text)
+        return call_openai(text, messages, on_delta, schema)
+    return call_local(text, messages, on_delta, schema)
+
+def parse_json(content: str, schema: type[BaseModel]) -> BaseModel:
+    """Validate an LLM reply against ``schema``, tolerating code fences around the JSON."""
+    start, end = content.find("{"), content.rfind("}")
+    if start < 0 or end < start:
+        raise RuntimeError(f"No JSON object in {schema.__name__} reply: {content[:500]}")
+    try:
+        return schema.model_validate_json(content[start:end + 1])
+    except ValidationError as e:
+        raise RuntimeError(f"Malformed {schema.__name__} JSON: {e}") from e
+
+def _generate(messages: list[dict[str, str]], schema: type[BaseModel], on_delta: OnDelta | None = None) -> BaseModel:
+    return summarize("", messages, on_delta, schema)["parsed"]
+
+def summarize_chunk(text: str, index: int, total: int, draft=None) -> ChunkOut:
+    """Sections of chunk ``index`` (1-based); with a ``draft``, stream into it as tokens arrive."""
+    on_delta = None
+    if draft is not None and SUMMARY_STREAM_CHUNKS:
+        on_delta = lambda delta: draft.append(index - 1, delta)  # noqa: E731
+    out = _generate(_chunk_messages(text, index, total), ChunkOut, on_delta)
+    if draft is not None:
+        draft.complete(index - 1, out)
+    return out
+
+def generate_mcqs(sections: list[Section], count: int = MAX_MCQS) -> list:
+    messages = _to_messages(_outline(sections), MCQ_PROMPT, f"تعداد سوال: {count}")
+    return _generate(messages, MCQSet).mcqs[:count]
+
+def generate_night_before(sections: list[Section]) -> str:
+    return _generate(_to_messages(_outline(sections), NIGHT_BEFORE_PROMPT), NightBefore).night_before
+
+def merge_summaries(parts: list[ChunkOut]) -> ChunkOut:
+    """Reduce step: concatenate per-chunk sections in order, without another LLM call."""
+    return ChunkOut(
+        title=next((p.title for p in parts if p.title.strip()), ""),
+        sections=[s for p in parts for s in p.sections]
+    )
+
+def summarize_map_reduce(
+    segments: list[dict],
+    max_tokens: int = SUMMARY_CHUNK_TOKENS,
+    overlap_tokens: int = SUMMARY_CHUNK_OVERLAP,
+    parallelism: int = SUMMARY_PARALLELISM,
+    draft=None
+) -> SummarizeOut:
+    """Summarize chunks of the ASR ``segments`` concurrently and merge them into one ``SummarizeOut``.
+
+    At most ``parallelism`` requests are in flight, so latency is about
+    the slowest chunk when there are no more chunks than that. With a
+    ``draft`` (see ``draft.MarkdownDraft``) generation is streamed into it.
+    The MCQs and the night-before summary are then generated from the
+    merged sections by two concurrent calls.
+    """
+    chunks = [c.text for c in chunk_segments(segments, max_tokens, overlap_tokens)]
+    if not chunks:
+        raise ValueError("Nothing to summarize: transcript is empty")
+    total = len(chunks)
+    if draft is not None:
+        draft.start(total)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(parallelism, total))) as pool:
+            parts = list(pool.map(summarize_chunk, chunks, range(1, total + 1), [total] * total, [draft] * total))
+    finally:
+        if draft is not None:
+            # Latest state, including whatever finished before a failure
+            draft.flush()
+    merged = merge_summaries(parts)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        mcqs = pool.submit(generate_mcqs, merged.sections)
+        night_before = pool.submit(generate_night_before, merged.sections)
+        return SummarizeOut(
+            title=merged.title,
+            sections=merged.sections,
+            mcqs=mcqs.result(),
+            night_before=night_before.result()
+        )
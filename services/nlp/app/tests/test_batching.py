@@ -0,0 +1,31 @@
+"""Tests for the cross-request micro-batcher."""
+import asyncio
+from app.batching import MicroBatcher
+
+
+def test_flushes_when_full_or_after_max_wait_per_key():
+    batches = []
+
+    async def run_batch(key, items):
+        batches.append((key, list(items)))
+        return [f"{key}:{i}" for i in items]
+
+    async def run():
+        batcher = MicroBatcher(run_batch, max_batch=2, max_wait_ms=5)
+        return await asyncio.gather(
+            batcher.submit(1, key="a"), batcher.submit(2, key="b"), batcher.submit(3, key="a")
+        )
+
+    assert asyncio.run(run()) == ["a:1", "b:2", "a:3"]
+    assert sorted(batches) == [("a", [1, 3]), ("b", [2])]
+
+
+def test_batch_error_reaches_every_caller():
+    async def run_batch(key, items):
+        raise RuntimeError("upstream failed")
+
+    async def run():
+        batcher = MicroBatcher(run_batch, max_batch=2, max_wait_ms=5)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
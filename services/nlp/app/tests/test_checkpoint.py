@@ -0,0 +1,77 @@
+"""Tests for transcript checkpoints."""
+import json
+from unittest.mock import patch
+import pytest
+from app.checkpoint import TranscriptCheckpoint, checkpoint_key, load_segments, transcript_key
+
+
+class FakeStore:
+    def __init__(self):
+        self.objects = {}
+
+    def upload(self, key, data, content_type="application/octet-stream"):
+        self.objects[key] = data
+        return key
+
+    def patches(self):
+        return (
+            patch("app.checkpoint.upload_bytes", self.upload),
+            patch("app.checkpoint.download_to_bytes", self.objects.__getitem__),
+            patch("app.checkpoint.exists", self.objects.__contains__),
+        )
+
+
+def _seg(start, end):
+    return {"start": start, "end": end, "text": f"{start}-{end}", "words": [{"start": start, "end": end, "word": "x"}]}
+
+
+def test_saves_periodically_and_resumes():
+    store = FakeStore()
+    p1, p2, p3 = store.patches()
+    with p1, p2, p3:
+        cp = TranscriptCheckpoint("j1", "audio.flac", interval=0)
+        cp.add(_seg(0.0, 2.5))
+        cp.add(_seg(2.5, 4.0))
+        saved = json.loads(store.objects[checkpoint_key("j1")])
+        assert "words" not in saved["segments"][0]
+        assert saved["complete"] is False
+
+        resumed = TranscriptCheckpoint.load("j1", "audio.flac")
+        assert resumed.offset == 4.0
+        assert [s["text"] for s in resumed.segments] == ["0.0-2.5", "2.5-4.0"]
+
+
+def test_checkpoint_from_other_audio_is_ignored():
+    store = FakeStore()
+    p1, p2, p3 = store.patches()
+    with p1, p2, p3:
+        cp = TranscriptCheckpoint("j1", "audio.m4a", interval=0)
+        cp.add(_seg(0.0, 2.5))
+        resumed = TranscriptCheckpoint.load("j1", "audio.m4a.norm.flac")
+        assert resumed.offset == 0.0 and not resumed.segments
+
+
+def test_complete_flag_round_trips():
+    store = FakeStore()
+    p1, p2, p3 = store.patches()
+    with p1, p2, p3:
+        cp = TranscriptCheckpoint("j1", "a", interval=3600)
+        cp.add(_seg(0.0, 1.0))
+        assert checkpoint_key("j1") not in store.objects
+        assert transcript_key("j1") not in store.objects
+        cp.save(complete=True)
+        assert TranscriptCheckpoint.load("j1", "a").complete
+        # the final transcript is published for the status API
+        assert store.objects[transcript_key("j1")] == b"0.0-1.0"
+
+
+def test_load_segments_requires_complete_transcript():
+    store = FakeStore()
+    p1, p2, p3 = store.patches()
+    with p1, p2, p3:
+        cp = TranscriptCheckpoint("j1", "audio.flac", interval=0)
+        cp.add(_seg(0.0, 2.5))
+        with pytest.raises(RuntimeError):
+            load_segments("j1")
+        cp.save(complete=True)
+        assert [s["text"] for s in load_segments("j1")] == ["0.0-2.5"]
@@ -1,7 +1,48 @@
-from app.chunker import chunk_by_length
+from app.chunker import chunk_by_length, chunk_segments
 
 def test_chunker_basic():
     text = ("الف\n"*200) + "پایان"
     parts = chunk_by_length(text, max_chars=100)
     assert len(parts) > 1
     assert any("پایان" in p for p in parts)
+
+
+def _seg(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+def test_chunk_segments_respects_budget_and_covers_all():
+    segs = [_seg(i * 5.0, i * 5.0 + 4.5, f"جملهٔ شمارهٔ {i} اینجاست.") for i in range(50)]
+    chunks = chunk_segments(segs, max_tokens=40, overlap_tokens=0, count_tokens=lambda t: len(t.split()))
+    assert all(c.tokens <= 40 for c in chunks)
+    assert chunks[0].start == 0.0 and chunks[-1].end == 49 * 5.0 + 4.5
+    text = "\n".join(c.text for c in chunks)
+    assert all(f"شمارهٔ {i} " in text for i in range(50))
+
+
+def test_chunk_segments_prefers_long_pause():
+    # a 3 s pause after segment 5 and sentence ends everywhere else
+    segs = []
+    t = 0.0
+    for i in range(10):
+        segs.append(_seg(t, t + 2, f"بخش {i} تمام شد."))
+        t += 2 + (3.0 if i == 5 else 0.2)
+    count = lambda t: len(t.split())  # noqa: E731
+    chunks = chunk_segments(segs, max_tokens=32, overlap_tokens=0, pause_seconds=1.5, count_tokens=count)
+    assert chunks[0].text.endswith("بخش 5 تمام شد.")
+    assert chunks[1].start > chunks[0].end + 2.5
+
+
+def test_chunk_segments_splits_sentences_and_overlaps():
+    segs = [_seg(0, 10, "یک دو سه. چهار پنج شش؟ هفت هشت نه.")]
+    chunks = chunk_segments(segs, max_tokens=6, overlap_tokens=3, count_tokens=lambda t: len(t.split()))
+    assert [c.text for c in chunks] == ["یک دو سه. چهار پنج شش؟", "چهار پنج شش؟ هفت هشت نه."]
+    # sentence times are interpolated within the segment
+    assert 0 < chunks[1].start < 5 and chunks[1].end == 10
+
+
+def test_chunk_segments_splits_oversized_sentence():
+    segs = [_seg(0, 20, " ".join(["کلمه"] * 30))]
+    chunks = chunk_segments(segs, max_tokens=10, overlap_tokens=0, count_tokens=lambda t: len(t.split()))
+    assert len(chunks) == 3
+    assert all(c.tokens == 10 for c in chunks)
@@ -0,0 +1,38 @@
+"""Tests for the streamed markdown draft."""
+from unittest.mock import patch
+from app.draft import MarkdownDraft, draft_key, partial_lines
+from app.schemas import ChunkOut, Section
+
+
+def test_partial_lines_reads_unterminated_json():
+    raw = '{"title": "t", "sections": [{"heading": "قلب", "summary": "بطن چپ \\"خون\\" را پمپ'
+    assert partial_lines(raw) == ["## قلب", "", 'بطن چپ "خون" را پمپ', ""]
+
+
+def test_draft_renders_done_and_streaming_chunks_and_flushes():
+    uploads = {}
+    marked = []
+    with patch("app.draft.upload_bytes", lambda k, d, ct: uploads.__setitem__(k, d.decode())), \
+            patch("app.draft.mark_available", lambda job_id, name: marked.append((job_id, name))):
+        draft = MarkdownDraft("j1", interval=0)
+        draft.start(2)
+        draft.append(1, '{"sections": [{"heading": "دوم", "summary": "در حال')
+        draft.complete(0, ChunkOut(
+            title="جلسه",
+            sections=[Section(heading="اول", summary="تمام", key_points=["k"], traps=[])]
+        ))
+    md = uploads[draft_key("j1")]
+    assert md.startswith("# جلسه")
+    assert md.index("## اول") < md.index("## دوم")
+    assert "- k" in md and "در حال" in md
+    assert marked == [("j1", "draft")]
+
+
+def test_flush_is_throttled():
+    calls = []
+    with patch("app.draft.upload_bytes", lambda *a: calls.append(a)), patch("app.draft.mark_available"):
+        draft = MarkdownDraft("j1", interval=3600)
+        draft.start(1)
+        for _ in range(50):
+            draft.append(0, "x")
+    assert len(calls) == 1
@@ -0,0 +1,78 @@
+"""Tests for the shared pooled HTTP session."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from app import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    failures = 0
+    retry_after = None
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if _Handler.failures:
+            _Handler.failures -= 1
+            self.send_response(503)
+            if _Handler.retry_after:
+                self.send_header("Retry-After", _Handler.retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_connections_are_reused():
+    server = _server()
+    s = http_client.build_session()
+    url = f"http://127.0.0.1:{server.server_port}/x"
+    try:
+        for _ in range(5):
+            assert s.post(url, json={}).json() == {"ok": True}
+        host = http_client.stats(s)[f"http://127.0.0.1:{server.server_port}"]
+        assert host == {"requests": 5, "connections": 1, "reuse_ratio": 0.8}
+    finally:
+        server.shutdown()
+
+
+def test_post_is_retried_on_503():
+    server = _server()
+    _Handler.failures = 2
+    with patch.object(http_client, "HTTP_BACKOFF_SECONDS", 0.0):
+        s = http_client.build_session()
+    try:
+        r = s.post(f"http://127.0.0.1:{server.server_port}/x", json={})
+        assert r.status_code == 200
+    finally:
+        server.shutdown()
+
+
+def test_long_retry_after_is_capped_and_returned_to_the_caller():
+    server = _server()
+    _Handler.failures, _Handler.retry_after = 10, "3000"
+    try:
+        with patch.object(http_client, "HTTP_RETRY_AFTER_MAX_SECONDS", 0.05):
+            s = http_client.build_session()
+            t0 = time.monotonic()
+            r = s.post(f"http://127.0.0.1:{server.server_port}/x", json={})
+        assert r.status_code == 503 and r.headers["Retry-After"] == "3000"
+        assert time.monotonic() - t0 < 2
+    finally:
+        _Handler.failures, _Handler.retry_after = 0, None
+        server.shutdown()
@@ -0,0 +1,21 @@
+"""Tests for the record of stored job outputs."""
+from unittest.mock import Mock
+import fakeredis
+import redis
+from app.job_outputs import available, mark_available
+
+
+def test_marked_outputs_are_available_per_job():
+    r = fakeredis.FakeRedis()
+    mark_available("j1", "preview", r)
+    mark_available("j1", "final", r)
+    mark_available("j1", "final", r)
+    assert available("j1", r) == {"preview", "final"}
+    assert available("j2", r) == set()
+
+
+def test_redis_errors_mean_nothing_available():
+    client = Mock()
+    client.hset.side_effect = client.hkeys.side_effect = redis.ConnectionError("down")
+    mark_available("j1", "draft", client)  # must not raise
+    assert available("j1", client) == set()
@@ -0,0 +1,188 @@
+"""Tests for the LLM batching broker."""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+import requests
+from fastapi.testclient import TestClient
+from app import llm_broker, summarizer
+
+
+def _response(data):
+    r = MagicMock()
+    r.json.return_value = data
+    return r
+
+
+def test_complete_batch_sends_one_completion_call():
+    def post(url, json, timeout):
+        if url.endswith("/tokenize"):
+            return _response({"tokens": list(range(len(json["messages"][-1]["content"])))})
+        assert json["prompt"] == [[0], [0, 1, 2]]
+        return _response({"id": "c", "model": "m", "choices": [
+            {"index": 1, "text": "دوم", "finish_reason": "stop"},
+            {"index": 0, "text": "اول", "finish_reason": "stop"},
+        ], "usage": {"prompt_tokens": 4, "prompt_tokens_details": {"cached_tokens": 4}}})
+
+    with patch.object(llm_broker.session, "post", side_effect=post) as mock:
+        out = llm_broker.complete_batch(
+            {"model": "m", "temperature": 0.2},
+            [[{"role": "user", "content": "a"}], [{"role": "user", "content": "abc"}]]
+        )
+    assert mock.call_count == 3
+    assert [o["choices"][0]["message"]["content"] for o in out] == ["اول", "دوم"]
+    assert [o["usage"]["prompt_tokens"] for o in out] == [1, 3]
+    assert [o["usage"]["prompt_tokens_details"]["cached_tokens"] for o in out] == [1, 3]
+
+
+def test_concurrent_requests_share_a_batch():
+    batches = []
+
+    def complete_batch(params, conversations):
+        batches.append((params, len(conversations)))
+        return [{"choices": [{"message": {"content": c[0]["content"]}}]} for c in conversations]
+
+    body = {"model": "m", "temperature": 0.2, "max_tokens": 10}
+    with patch.object(llm_broker, "complete_batch", complete_batch), \
+            patch.object(llm_broker.batcher, "max_wait", 0.2), \
+            TestClient(llm_broker.app) as client:
+        with ThreadPoolExecutor(4) as pool:
+            replies = list(pool.map(
+                lambda i: client.post("/v1/chat/completions", json={**body, "messages": [{"role": "user", "content": str(i)}]}),
+                range(4)
+            ))
+    assert [r.json()["choices"][0]["message"]["content"] for r in replies] == ["0", "1", "2", "3"]
+    assert batches == [(body, 4)]
+
+
+def test_failed_batch_falls_back_to_single_requests():
+    calls = []
+
+    def complete_batch(params, conversations):
+        calls.append(len(conversations))
+        if len(conversations) > 1 or conversations[0][0]["content"] == "bad":
+            raise RuntimeError("upstream rejected the batch")
+        return [{"choices": [{"message": {"content": conversations[0][0]["content"]}}]}]
+
+    body = {"model": "m", "max_tokens": 10}
+    with patch.object(llm_broker, "complete_batch", complete_batch), \
+            patch.object(llm_broker.batcher, "max_wait", 0.2), \
+            TestClient(llm_broker.app) as client:
+        with ThreadPoolExecutor(3) as pool:
+            replies = list(pool.map(
+                lambda text: client.post("/v1/chat/completions", json={**body, "messages": [{"role": "user", "content": text}]}),
+                ["a", "bad", "b"]
+            ))
+    assert calls == [3, 1, 1, 1]
+    assert [r.status_code for r in replies] == [200, 502, 200]
+    assert replies[2].json()["choices"][0]["message"]["content"] == "b"
+
+
+def test_proxied_upstream_error_keeps_its_status():
+    upstream = MagicMock(status_code=400, content=b'{"error": "bad"}', headers={"content-type": "application/json"})
+    upstream.__enter__.return_value = upstream
+    with patch.object(llm_broker.session, "post", return_value=upstream):
+        r = TestClient(llm_broker.app).post("/v1/chat/completions", json={"n": 2, "messages": []})
+    assert r.status_code == 400 and r.json() == {"error": "bad"}
+    upstream.iter_content.assert_not_called()
+
+
+def test_unreachable_upstream_is_502():
+    with patch.object(llm_broker.session, "post", side_effect=requests.ConnectionError("refused")):
+        r = TestClient(llm_broker.app).post("/v1/chat/completions", json={"n": 2, "stream": True, "messages": []})
+    assert r.status_code == 502
+
+
+def test_multi_choice_stream_is_proxied():
+    upstream = MagicMock(status_code=200, headers={"content-type": "text/event-stream"})
+    upstream.__enter__.return_value = upstream
+    upstream.iter_content.return_value = [b"data: {}\n\n", b"data: [DONE]\n\n"]
+    with patch.object(llm_broker.session, "post", return_value=upstream):
+        r = TestClient(llm_broker.app).post("/v1/chat/completions", json={"n": 2, "stream": True, "messages": []})
+    assert r.status_code == 200 and r.text == "data: {}\n\ndata: [DONE]\n\n"
+    upstream.__exit__.assert_called_once()
+
+
+def _upstream_stream(lines):
+    r = MagicMock(status_code=200)
+    r.__enter__.return_value = r
+    r.iter_lines.return_value = lines
+    return r
+
+
+def _completion_event(index, text, finish_reason=None):
+    return ("data: " + json.dumps({"id": "c", "model": "m", "choices": [
+        {"index": index, "text": text, "finish_reason": finish_reason}
+    ]}, ensure_ascii=False)).encode()
+
+
+def _split(params, lines, prompts):
+    streams = [[] for _ in prompts]
+    llm_broker.relay_stream(_upstream_stream(lines), prompts, params, lambda i, d: streams[i].append(d))
+    return streams
+
+
+def test_batched_stream_is_split_by_choice_index():
+    lines = [
+        _completion_event(1, "دو"), _completion_event(0, "یک"),
+        _completion_event(0, "", "stop"), _completion_event(1, "م", "stop"),
+        b'data: {"id": "c", "choices": [], "usage": {"prompt_tokens": 4, "prompt_tokens_details": {"cached_tokens": 4}}}',
+        b"data: [DONE]",
+    ]
+    params = {"model": "m", "stream_options": {"include_usage": True}}
+    streams = _split(params, lines, [[0], [0, 1, 2]])
+    assert all(s[-1] is None and s[-2] == b"data: [DONE]\n\n" for s in streams)
+
+    # Each split stream reads like a chat completion stream to the summarizer
+    for stream, text, cached in zip(streams, ["یک", "دوم"], [1, 3]):
+        response = _upstream_stream(b"".join(stream[:-1]).split(b"\n"))
+        with patch.object(summarizer.session, "post", return_value=response):
+            content, usage, _ = summarizer._stream_chat("u", {}, None, "local", lambda d: None)
+        assert content == text and usage["prompt_tokens_details"]["cached_tokens"] == cached
+
+
+def test_cut_off_batched_stream_ends_without_done():
+    streams = _split({"model": "m"}, [_completion_event(0, "یک"), b"data: {not json"], [[0], [0]])
+    assert streams[1] == [None]
+    assert b"[DONE]" not in b"".join(streams[0][:-1])
+
+
+def test_concurrent_streamed_requests_share_a_batch():
+    opened = []
+
+    def open_stream(params, conversations):
+        opened.append((params, len(conversations)))
+        lines = [_completion_event(i, c[0]["content"], "stop") for i, c in enumerate(conversations)] + [b"data: [DONE]"]
+        return _upstream_stream(lines), [[0]] * len(conversations)
+
+    body = {"model": "m", "stream": True}
+    with patch.object(llm_broker, "open_stream", open_stream), \
+            patch.object(llm_broker.batcher, "max_wait", 0.2), \
+            TestClient(llm_broker.app) as client:
+        with ThreadPoolExecutor(3) as pool:
+            replies = list(pool.map(
+                lambda i: client.post("/v1/chat/completions", json={**body, "messages": [{"role": "user", "content": str(i)}]}),
+                range(3)
+            ))
+    assert opened == [({"model": "m"}, 3)]
+    for i, r in enumerate(replies):
+        events = [line[6:] for line in r.text.split("\n\n") if line]
+        assert events[-1] == "[DONE]"
+        assert json.loads(events[0])["choices"][0]["delta"]["content"] == str(i)
+
+
+def test_failed_streamed_batch_falls_back_to_single_streams():
+    def open_stream(params, conversations):
+        if len(conversations) > 1:
+            raise RuntimeError("upstream rejected the batch")
+        return _upstream_stream([_completion_event(0, conversations[0][0]["content"], "stop"), b"data: [DONE]"]), [[0]]
+
+    body = {"model": "m", "stream": True}
+    with patch.object(llm_broker, "open_stream", open_stream), \
+            patch.object(llm_broker.batcher, "max_wait", 0.2), \
+            TestClient(llm_broker.app) as client:
+        with ThreadPoolExecutor(2) as pool:
+            replies = list(pool.map(
+                lambda i: client.post("/v1/chat/completions", json={**body, "messages": [{"role": "user", "content": str(i)}]}),
+                range(2)
+            ))
+    assert [r.text.endswith("data: [DONE]\n\n") for r in replies] == [True, True]
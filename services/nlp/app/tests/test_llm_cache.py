@@ -0,0 +1,91 @@
+"""Tests for the Redis-backed LLM response cache."""
+from unittest.mock import Mock, patch
+import fakeredis
+import pytest
+import redis
+from app import summarizer
+from app.llm_cache import LLMCache
+
+
+def _cache(**kw):
+    return LLMCache(fakeredis.FakeRedis(), ttl=kw.get("ttl", 60), max_bytes=kw.get("max_bytes", 1000))
+
+
+def test_key_depends_on_model_messages_and_sampling():
+    base = {"model": "m", "messages": [{"role": "user", "content": "x"}], "temperature": 0.2}
+    k = LLMCache.key("u", base)
+    assert k == LLMCache.key("u", dict(reversed(list(base.items()))))
+    assert k != LLMCache.key("u", {**base, "temperature": 0.3})
+    assert k != LLMCache.key("u", {**base, "model": "n"})
+    assert k != LLMCache.key("other", base)
+
+
+def test_get_put_and_hit_rate():
+    c = _cache()
+    assert c.get("k") is None
+    c.put("k", "سلام")
+    assert c.get("k") == "سلام"
+    stats = c.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    assert stats["bytes"] == len("سلام".encode())
+
+
+def test_size_eviction_drops_least_recently_used():
+    c = _cache(max_bytes=250)
+    for k in "abc":
+        c.put(k, "x" * 100)
+    assert c.get("a") is None
+    assert c.get("c") == "x" * 100
+    assert c.stats()["entries"] == 2 and c.stats()["bytes"] == 200
+
+
+def test_redis_errors_are_misses():
+    client = Mock()
+    client.get.side_effect = redis.ConnectionError("down")
+    client.hget.side_effect = redis.ConnectionError("down")
+    c = LLMCache(client, ttl=60, max_bytes=1000)
+    assert c.get("k") is None
+    c.put("k", "v")  # must not raise
+
+
+def test_hits_skip_the_network():
+    response = Mock(status_code=200, text="")
+    response.json.return_value = {"choices": [{"message": {"content": "خلاصه"}, "finish_reason": "stop"}]}
+    with patch.object(summarizer, "llm_cache", _cache()), \
+            patch.object(summarizer.session, "post", return_value=response) as post:
+        assert summarizer.call_local("متن")["raw"] == "خلاصه"
+        assert summarizer.call_local("متن")["raw"] == "خلاصه"
+        assert post.call_count == 1
+
+
+def _reply(content):
+    response = Mock(status_code=200, text=content)
+    response.json.return_value = {"choices": [{"message": {"content": content}, "finish_reason": "stop"}]}
+    return response
+
+
+def test_invalid_reply_is_not_cached():
+    valid = '{"night_before": "مرور"}'
+    cache = _cache()
+    with patch.object(summarizer, "llm_cache", cache), \
+            patch.object(summarizer.session, "post", side_effect=[_reply('{"night_before": '), _reply(valid)]) as post:
+        with pytest.raises(RuntimeError, match="NightBefore"):
+            summarizer.generate_night_before([])
+        assert cache.stats()["entries"] == 0
+        assert summarizer.generate_night_before([]) == "مرور"
+        assert summarizer.generate_night_before([]) == "مرور"
+    assert post.call_count == 2
+
+
+def test_invalid_cached_reply_is_dropped_and_requested_again():
+    cache = _cache()
+    messages = summarizer._to_messages(summarizer._outline([]), summarizer.NIGHT_BEFORE_PROMPT)
+    with patch.object(summarizer, "llm_cache", cache), \
+            patch.object(summarizer.session, "post", return_value=_reply('{"night_before": "تازه"}')) as post:
+        summarizer.call_local("", messages, schema=summarizer.NightBefore)
+        key = cache.key(post.call_args.args[0], post.call_args.kwargs["json"])
+        cache.put(key, "not json")
+        assert summarizer.generate_night_before([]) == "تازه"
+    assert post.call_count == 2
+    assert cache.get(key) == '{"night_before": "تازه"}'
+    assert cache.stats()["evictions"] == 0
@@ -0,0 +1,20 @@
+"""Tests for per-call LLM token and latency stats."""
+from app.llm_metrics import CallStats, usage_tokens
+
+
+def test_usage_tokens_handles_missing_details():
+    assert usage_tokens(None) == (0, 0)
+    assert usage_tokens({"prompt_tokens": 10}) == (10, 0)
+    assert usage_tokens({"prompt_tokens": 10, "prompt_tokens_details": {"cached_tokens": 8}}) == (10, 8)
+
+
+def test_ttft_is_split_by_prefix_cache_hits():
+    stats = CallStats()
+    stats.record("ChunkOut", {"prompt_tokens": 100}, latency=2.0, ttft=0.4)
+    stats.record("ChunkOut", {"prompt_tokens": 100, "prompt_tokens_details": {"cached_tokens": 60}}, 1.0, 0.1)
+    stats.record("ChunkOut", {"prompt_tokens": 100}, latency=1.5)
+    out = stats.stats()["ChunkOut"]
+    assert out["calls"] == 3 and out["prompt_tokens"] == 300 and out["cached_tokens"] == 60
+    assert out["cached_ratio"] == 0.2
+    assert out["mean_latency"] == 1.5
+    assert out["mean_ttft_cached"] == 0.1 and out["mean_ttft_uncached"] == 0.4
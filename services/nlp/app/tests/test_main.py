@@ -0,0 +1,55 @@
+"""Tests for the on-demand PDF download endpoint."""
+import os
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("POSTGRES_DSN", "sqlite://")
+
+from app import main  # noqa: E402
+from app.pdf_cache import pdf_key  # noqa: E402
+
+
+class FakeSession:
+    def get(self, model, job_id):
+        return SimpleNamespace(id=job_id, md_key=f"jobs/{job_id}/output.md") if job_id == "j1" else None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pdf():
+    stored = set()
+    render = MagicMock()
+    with patch("app.main.SessionLocal", FakeSession), \
+            patch("app.main.exists", lambda key: key in stored), \
+            patch("app.main.presign", lambda key: f"https://s3/{key}"), \
+            patch("app.main.claim_render", lambda job_id: True), \
+            patch.object(main.render_pdf_task, "delay", render):
+        yield stored, render
+
+
+def test_unknown_job_is_404(pdf):
+    assert TestClient(main.app).get("/api/jobs/nope/pdf").status_code == 404
+
+
+def test_first_download_queues_render_and_waits_for_it(pdf):
+    stored, render = pdf
+    client = TestClient(main.app)
+    # The render lands while the download polls
+    timer = threading.Timer(0.6, stored.add, [pdf_key("j1")])
+    timer.start()
+    with patch("app.main.PDF_WAIT_SECONDS", 5):
+        r = client.get("/api/jobs/j1/pdf", follow_redirects=False)
+    timer.join()
+    assert r.status_code == 307 and r.headers["location"] == f"https://s3/{pdf_key('j1')}"
+    render.assert_called_once_with("j1")
+
+
+def test_slow_render_answers_202(pdf):
+    with patch("app.main.PDF_WAIT_SECONDS", 0.1):
+        r = TestClient(main.app).get("/api/jobs/j1/pdf", follow_redirects=False)
+    assert r.status_code == 202 and r.headers["retry-after"] == "5"
@@ -0,0 +1,25 @@
+"""Tests for deduplicating on-demand PDF renders."""
+from concurrent.futures import ThreadPoolExecutor
+import fakeredis
+from app.pdf_cache import claim_render, release_render
+
+
+def test_only_one_concurrent_claim_wins():
+    r = fakeredis.FakeRedis()
+    with ThreadPoolExecutor(8) as pool:
+        claims = list(pool.map(lambda _: claim_render("j1", r), range(8)))
+    assert claims.count(True) == 1
+    assert claim_render("j2", r)
+
+
+def test_release_allows_a_new_render():
+    r = fakeredis.FakeRedis()
+    assert claim_render("j1", r)
+    release_render("j1", r)
+    assert claim_render("j1", r)
+
+
+def test_claim_expires():
+    r = fakeredis.FakeRedis()
+    assert claim_render("j1", r)
+    assert 0 < r.ttl("pdf-render:j1") <= 300
@@ -0,0 +1,48 @@
+"""Tests for parsing the ASR service's responses."""
+import json
+from unittest.mock import MagicMock, patch
+import pytest
+from app import pipeline
+from app.pipeline import ASRStreamError, iter_asr_segments
+
+
+def _response(content_type, lines=(), body=None):
+    r = MagicMock()
+    r.__enter__.return_value = r
+    r.headers = {"content-type": content_type}
+    r.iter_lines.return_value = [json.dumps(e).encode() if isinstance(e, dict) else e for e in lines]
+    r.json.return_value = body
+    return r
+
+
+def _segments(response):
+    with patch.object(pipeline.session, "post", return_value=response):
+        return list(iter_asr_segments(b"audio", "http://asr/transcribe"))
+
+
+def _seg(start):
+    return {"type": "segment", "start": start, "end": start + 1, "text": f"t{start}", "words": []}
+
+
+def test_streamed_segments_in_order():
+    lines = [{"type": "info", "language": "fa", "duration": 2.0}, _seg(0.0), b"", _seg(1.0), {"type": "done", "segments": 2}]
+    out = _segments(_response(pipeline.NDJSON_MEDIA_TYPE, lines))
+    assert [s["start"] for s in out] == [0.0, 1.0]
+
+
+def test_error_line_raises():
+    lines = [{"type": "info"}, _seg(0.0), {"type": "error", "detail": "CUDA out of memory"}]
+    with pytest.raises(ASRStreamError, match="CUDA out of memory"):
+        _segments(_response(pipeline.COLUMNAR_NDJSON_MEDIA_TYPE, lines))
+
+
+def test_stream_without_done_raises():
+    lines = [{"type": "info"}, _seg(0.0)]
+    with pytest.raises(ASRStreamError, match="before completion"):
+        _segments(_response(pipeline.NDJSON_MEDIA_TYPE, lines))
+
+
+def test_falls_back_to_plain_json():
+    body = {"language": "fa", "segments": [{"start": 0.0, "end": 1.0, "text": "t"}]}
+    out = _segments(_response("application/json", body=body))
+    assert out == body["segments"]
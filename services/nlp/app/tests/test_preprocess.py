@@ -0,0 +1,46 @@
+"""Tests for upload-time audio normalization."""
+import io
+import wave
+import av
+import numpy as np
+from app.preprocess import SAMPLE_RATE, normalize_bytes, normalized_key
+
+
+def _wav(*parts, sr=44100, channels=2):
+    """Stereo WAV of alternating silence/tone parts given in seconds."""
+    chunks = []
+    for i, seconds in enumerate(parts):
+        t = np.arange(int(seconds * sr)) / sr
+        amp = 0.3 if i % 2 else 0.0
+        chunks.append((amp * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16))
+    pcm = np.repeat(np.concatenate(chunks)[:, None], channels, axis=1)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def _decode(data):
+    with av.open(io.BytesIO(data)) as c:
+        stream = c.streams.audio[0]
+        samples = sum(f.samples for f in c.decode(stream))
+        return stream.rate, stream.layout.name, samples / stream.rate
+
+
+def test_normalized_key_sits_next_to_upload():
+    assert normalized_key("jobs/1/audio/talk.m4a") == "jobs/1/audio/talk.m4a.norm.flac"
+
+
+def test_converts_to_16k_mono_and_trims_edges():
+    out = normalize_bytes(_wav(2, 3, 1.5, 3, 2))
+    rate, layout, seconds = _decode(out)
+    assert (rate, layout) == (SAMPLE_RATE, "mono")
+    # inner silence is kept, edges are cut down to the padding
+    assert 7.5 <= seconds <= 8.5
+
+
+def test_all_silence_returns_none():
+    assert normalize_bytes(_wav(3)) is None
@@ -0,0 +1,108 @@
+"""Tests for the preview transcript tier."""
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("POSTGRES_DSN", "sqlite://")
+
+from app import celery_app, main  # noqa: E402
+from app.checkpoint import preview_key, transcript_key  # noqa: E402
+
+
+class FakeSession:
+    def __init__(self, job):
+        self.job = job
+
+    def get(self, model, job_id):
+        return self.job if self.job and self.job.id == job_id else None
+
+    def close(self):
+        pass
+
+
+def _job(**fields):
+    return SimpleNamespace(**{"id": "j1", "status": "processing", "error": None, "audio_key": "a.m4a",
+                              "md_key": None, "pdf_key": None, **fields})
+
+
+@pytest.fixture
+def store():
+    objects, outputs = {}, set()
+    objects["outputs"] = outputs
+    with patch("app.celery_app.available", lambda job_id: set(outputs)), \
+            patch("app.celery_app.mark_available", lambda job_id, name: outputs.add(name)), \
+            patch("app.celery_app.upload_bytes", lambda k, d, ct: objects.__setitem__(k, d.decode())), \
+            patch("app.celery_app.SessionLocal", lambda: FakeSession(_job())), \
+            patch("app.celery_app.load_asr_audio", lambda job: ("a.flac", b"audio", {})), \
+            patch("app.celery_app.ASR_PREVIEW_URL", "http://asr-preview:7000/transcribe"), \
+            patch("app.celery_app.PREVIEW_FLUSH_SECONDS", 0):
+        yield objects
+
+
+def _segments(*texts, after=None):
+    def stream(audio, url, model=None, **upload):
+        assert url == "http://asr-preview:7000/transcribe" and model == celery_app.ASR_PREVIEW_MODEL
+        for i, text in enumerate(texts):
+            if after:
+                after(i)
+            yield {"start": float(i), "end": i + 1.0, "text": f" {text} "}
+    return stream
+
+
+def test_preview_is_flushed_while_streaming(store):
+    seen = []
+    stream = _segments("a", "b", "c", after=lambda i: seen.append(store.get(preview_key("j1"))))
+    with patch("app.celery_app.iter_asr_segments", stream):
+        celery_app.preview_transcript_task("j1")
+    assert seen == [None, "a", "a\nb"]
+    assert store[preview_key("j1")] == "a\nb\nc"
+    assert store["outputs"] == {"preview"}
+
+
+def test_preview_stops_once_final_transcript_exists(store):
+    stream = _segments("a", "b", "c", after=lambda i: i == 2 and store["outputs"].add("final"))
+    with patch("app.celery_app.iter_asr_segments", stream):
+        celery_app.preview_transcript_task("j1")
+    assert store[preview_key("j1")] == "a\nb"
+
+
+def test_preview_failure_is_swallowed(store):
+    def fail(*a, **kw):
+        raise RuntimeError("asr down")
+        yield
+
+    with patch("app.celery_app.iter_asr_segments", fail):
+        celery_app.preview_transcript_task("j1")
+    assert preview_key("j1") not in store and not store["outputs"]
+
+
+@pytest.mark.parametrize("url,queued", [("", False), ("http://asr-preview:7000/transcribe", True)])
+def test_preview_is_only_queued_with_its_own_asr_url(url, queued):
+    preview = MagicMock()
+    with patch("app.celery_app.ASR_PREVIEW_URL", url), \
+            patch("app.celery_app.SessionLocal", lambda: FakeSession(_job())), \
+            patch("app.celery_app.prepare_audio", lambda key: key), \
+            patch("app.celery_app.pipeline_chain", MagicMock()), \
+            patch.object(celery_app.preview_transcript_task, "delay", preview):
+        celery_app.preprocess_audio_task("j1")
+    assert preview.called is queued
+
+
+@pytest.mark.parametrize("outputs,tier", [
+    ((), None),
+    (("preview",), "preview"),
+    (("preview", "final"), "final"),
+])
+def test_job_status_reports_transcript_tier(outputs, tier):
+    with patch("app.main.SessionLocal", lambda: FakeSession(_job())), \
+            patch("app.main.available", lambda job_id: set(outputs)), \
+            patch("app.main.exists", side_effect=AssertionError("status polls must not touch storage")), \
+            patch("app.main.presign", lambda key: f"https://s3/{key}"):
+        body = TestClient(main.app).get("/api/jobs/j1").json()
+    assert body["transcript_tier"] == tier
+    if tier:
+        assert body["transcript_url"] == f"https://s3/{transcript_key('j1') if tier == 'final' else preview_key('j1')}"
+    else:
+        assert body["transcript_url"] is None
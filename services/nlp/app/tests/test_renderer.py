@@ -1,4 +1,5 @@
-from app.renderers import build_markdown
+from app.renderers import build_markdown, markdown_to_html, summary_to_markdown
+from app.schemas import MCQ, Section, SummarizeOut
 
 
 def test_md_build():
@@ -17,3 +18,24 @@ def test_md_build_preserves_leading_whitespace():
     # Leading spaces should be preserved
     assert md.startswith("  #")
     assert md.endswith("\n")
+
+
+def test_summary_to_markdown():
+    out = SummarizeOut(
+        title="قلب",
+        sections=[Section(heading="آناتومی", summary="خلاصه", key_points=["نکته"], traps=["دام"])],
+        mcqs=[MCQ(stem="سوال؟", options=["الف", "ب", "ج", "د"], answer="الف", rationale="چون")],
+        night_before="مرور"
+    )
+    md = summary_to_markdown(out)
+    assert md.startswith("# قلب\n")
+    assert "## آناتومی" in md and "- نکته" in md and "- دام" in md
+    assert "1. سوال؟" in md and "**پاسخ:** الف" in md
+    assert md.rstrip().endswith("مرور")
+
+
+def test_markdown_to_html_reuses_converter_without_leaking_state():
+    first = markdown_to_html("# یک\n\nمتن اول")
+    second = markdown_to_html("# دو")
+    assert "<h1>یک</h1>" in first
+    assert second == "<h1>دو</h1>"
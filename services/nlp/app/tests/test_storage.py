@@ -1,7 +1,8 @@
 """Tests for storage module."""
 import pytest
 from unittest.mock import Mock, patch
-from app.storage import upload_bytes, presign, download_to_bytes
+import botocore.exceptions
+from app.storage import upload_bytes, presign, download_to_bytes, exists
 
 
 @patch("app.storage.s3")
@@ -31,3 +32,13 @@ def test_download_to_bytes_success(mock_s3):
     data = download_to_bytes("test/key.txt")
     assert data == b"content"
     mock_s3.get_object.assert_called_once()
+
+
+@patch("app.storage.s3")
+def test_exists(mock_s3):
+    """Test object existence check, including a missing key."""
+    assert exists("test/key.txt") is True
+    mock_s3.head_object.side_effect = botocore.exceptions.ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+    assert exists("test/missing.txt") is False
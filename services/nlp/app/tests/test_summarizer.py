@@ -0,0 +1,143 @@
+"""Tests for map-reduce summarization."""
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+import pytest
+from app import summarizer
+from app.schemas import MCQ, ChunkOut, MCQSet, Section, SummarizeOut
+
+
+def _part(i):
+    return ChunkOut(title=f"t{i}", sections=[Section(heading=f"h{i}", summary="s", key_points=["k"], traps=[])])
+
+
+def _mcq(stem):
+    return MCQ(stem=stem, options=["a", "b", "c", "d"], answer="a", rationale="r")
+
+
+def test_parse_json_strips_code_fences():
+    body = json.dumps(_part(1).model_dump(), ensure_ascii=False)
+    out = summarizer.parse_json(f"```json\n{body}\n```", ChunkOut)
+    assert out.sections[0].heading == "h1"
+
+
+def test_parse_json_rejects_schema_mismatch():
+    with pytest.raises(RuntimeError, match="ChunkOut"):
+        summarizer.parse_json('{"title": "t", "sections": [{"heading": "h"}]}', ChunkOut)
+
+
+def test_merge_keeps_order():
+    merged = summarizer.merge_summaries([_part(1), _part(2)])
+    assert merged.title == "t1"
+    assert [s.heading for s in merged.sections] == ["h1", "h2"]
+
+
+def test_requests_guided_json():
+    with patch.object(summarizer, "llm_cache", None), \
+            patch.object(summarizer.session, "post") as post:
+        post.return_value.json.return_value = {
+            "choices": [{"message": {"content": json.dumps({"mcqs": [_mcq("q").model_dump()]})}, "finish_reason": "stop"}]
+        }
+        mcqs = summarizer.generate_mcqs(_part(1).sections, count=1)
+    assert [q.stem for q in mcqs] == ["q"]
+    fmt = post.call_args.kwargs["json"]["response_format"]
+    assert fmt["type"] == "json_schema"
+    assert fmt["json_schema"]["schema"] == MCQSet.model_json_schema()
+
+
+def test_chunks_run_concurrently_with_limit():
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def fake_chunk(text, index, total, draft=None):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.1)
+        with lock:
+            active -= 1
+        return _part(index)
+
+    segments = [{"start": 10.0 * i, "end": 10.0 * i + 8, "text": f"paragraph {i} " + "x" * 50} for i in range(8)]
+    with patch.object(summarizer, "summarize_chunk", fake_chunk), \
+            patch.object(summarizer, "generate_mcqs", lambda sections: [_mcq("q")]), \
+            patch.object(summarizer, "generate_night_before", lambda sections: "n"):
+        t0 = time.monotonic()
+        out = summarizer.summarize_map_reduce(segments, max_tokens=25, overlap_tokens=0, parallelism=4)
+        elapsed = time.monotonic() - t0
+    assert peak == 4
+    assert elapsed < 0.35  # two waves of 0.1 s, not eight
+    assert [s.heading for s in out.sections] == [f"h{i}" for i in range(1, 9)]
+    assert [q.stem for q in out.mcqs] == ["q"] and out.night_before == "n"
+
+
+def test_mcqs_and_night_before_run_in_parallel():
+    def slow(value):
+        def call(sections):
+            time.sleep(0.2)
+            return value
+        return call
+
+    segments = [{"start": 0.0, "end": 5.0, "text": "x"}]
+    with patch.object(summarizer, "summarize_chunk", lambda text, index, total, draft=None: _part(index)), \
+            patch.object(summarizer, "generate_mcqs", slow([_mcq("q")])), \
+            patch.object(summarizer, "generate_night_before", slow("n")):
+        t0 = time.monotonic()
+        out = summarizer.summarize_map_reduce(segments)
+        elapsed = time.monotonic() - t0
+    assert elapsed < 0.35
+    assert isinstance(out, SummarizeOut) and out.night_before == "n"
+
+
+def test_streamed_completion_passes_deltas():
+    events = [
+        b'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        b"",
+        'data: {"choices": [{"delta": {"content": "سلا"}}]}'.encode(),
+        'data: {"choices": [{"delta": {"content": "م"}, "finish_reason": "stop"}]}'.encode(),
+        b'data: {"choices": [], "usage": {"prompt_tokens": 50, "prompt_tokens_details": {"cached_tokens": 40}}}',
+        b"data: [DONE]",
+    ]
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_lines.return_value = events
+    deltas = []
+    with patch.object(summarizer, "llm_cache", None), \
+            patch.object(summarizer, "llm_calls") as calls, \
+            patch.object(summarizer.session, "post", return_value=response) as post:
+        out = summarizer.call_local("متن", on_delta=deltas.append)
+    assert out["raw"] == "سلام"
+    assert deltas == ["سلا", "م"]
+    assert post.call_args.kwargs["json"]["stream"] is True
+    assert calls.record.call_args.args[:2] == ("text", {"prompt_tokens": 50, "prompt_tokens_details": {"cached_tokens": 40}})
+    assert calls.record.call_args.args[3] is not None  # time to first token
+
+
+@pytest.mark.parametrize("events", [
+    # Connection dropped before [DONE]
+    ['data: {"choices": [{"delta": {"content": "{\\"title"}}]}'.encode()],
+    # Hit max_tokens
+    ['data: {"choices": [{"delta": {"content": "{\\"title"}, "finish_reason": "length"}]}'.encode(), b"data: [DONE]"],
+])
+def test_truncated_stream_is_retryable_and_not_cached(events):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_lines.return_value = events
+    cache = MagicMock()
+    cache.get.return_value = None
+    with patch.object(summarizer, "llm_cache", cache), \
+            patch.object(summarizer.session, "post", return_value=response):
+        with pytest.raises(summarizer.LLMIncompleteError):
+            summarizer.call_local("متن", on_delta=lambda d: None)
+    cache.put.assert_not_called()
+
+
+def test_chunk_messages_share_a_prefix():
+    first = summarizer._chunk_messages("متن اول", 1, 5)
+    second = summarizer._chunk_messages("متن دوم", 4, 5)
+    assert first[0] == second[0]
+    a, b = first[1]["content"], second[1]["content"]
+    shared = next(i for i, (x, y) in enumerate(zip(a, b)) if x != y)
+    assert a[:shared].startswith(summarizer.CHUNK_PROMPT)
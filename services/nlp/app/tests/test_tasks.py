@@ -0,0 +1,167 @@
+"""Tests for the pipeline stage tasks."""
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import pytest
+import requests
+
+os.environ.setdefault("POSTGRES_DSN", "sqlite://")
+
+from app import celery_app, summarizer  # noqa: E402
+from app.pdf_cache import md_key  # noqa: E402
+
+
+class Retried(Exception):
+    pass
+
+
+def _task(retries=0):
+    return SimpleNamespace(
+        name="transcribe_task", max_retries=3, default_retry_delay=30,
+        request=SimpleNamespace(retries=retries), retry=MagicMock(return_value=Retried())
+    )
+
+
+def _http_error(status, headers):
+    response = requests.Response()
+    response.status_code, response.headers = status, requests.structures.CaseInsensitiveDict(headers)
+    return requests.HTTPError(response=response)
+
+
+def test_busy_asr_is_retried_after_its_retry_after():
+    task = _task()
+    with pytest.raises(Retried):
+        celery_app._retry_or_fail(task, "j1", _http_error(503, {"Retry-After": "3000"}))
+    assert task.retry.call_args.kwargs["countdown"] == 3000
+
+
+def test_errors_without_retry_after_use_the_default_delay():
+    task = _task()
+    with pytest.raises(Retried):
+        celery_app._retry_or_fail(task, "j1", requests.ConnectionError("refused"))
+    assert task.retry.call_args.kwargs["countdown"] is None
+
+
+def test_preprocess_failure_still_starts_the_pipeline():
+    session = MagicMock()
+    session.get.return_value = SimpleNamespace(id="j1", audio_key="a.m4a")
+    chain = MagicMock()
+
+    def s3_down(key):
+        raise RuntimeError("S3 unavailable")
+
+    with patch("app.celery_app.SessionLocal", lambda: session), \
+            patch("app.celery_app.exists", s3_down), \
+            patch("app.celery_app.pipeline_chain", chain):
+        celery_app.preprocess_audio_task("j1")
+    chain.assert_called_once_with("j1")
+    chain.return_value.delay.assert_called_once()
+    session.close.assert_called_once()
+
+
+class JobSession:
+    """Every session sees the same job, like rows in one database."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def get(self, model, job_id):
+        return self.job if job_id == self.job.id else None
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def job():
+    job = SimpleNamespace(id="j1", status="queued", error=None, audio_key="a.m4a", md_key=None, pdf_key=None)
+    with patch("app.celery_app.SessionLocal", lambda: JobSession(job)), \
+            patch("app.celery_app.mark_available"):
+        yield job
+
+
+@pytest.fixture
+def asr(job):
+    with patch("app.celery_app.load_asr_audio", lambda job: ("a.flac", b"audio", {})), \
+            patch("app.celery_app.TranscriptCheckpoint") as checkpoint, \
+            patch("app.celery_app.transcribe") as transcribe:
+        checkpoint.load.return_value.segments = [{"start": 0.0, "end": 1.0, "text": "x"}]
+        yield transcribe
+
+
+@pytest.fixture
+def llm(job):
+    uploads = {}
+    with patch("app.celery_app.load_segments", return_value=[{"start": 0.0, "end": 1.0, "text": "x"}]) as segments, \
+            patch("app.celery_app.summarize_map_reduce") as summarize, \
+            patch("app.celery_app.summary_to_markdown", return_value="# md"), \
+            patch("app.celery_app.MarkdownDraft"), \
+            patch("app.celery_app.upload_bytes", lambda k, d, ct: uploads.__setitem__(k, d)):
+        yield SimpleNamespace(segments=segments, summarize=summarize, uploads=uploads)
+
+
+def test_asr_errors_are_retried_until_success(job, asr):
+    asr.side_effect = [requests.ConnectionError("reset"), celery_app.ASRStreamError("cut"), None]
+    result = celery_app.transcribe_task.apply(args=("j1",))
+    assert result.successful() and asr.call_count == 3
+    assert job.status == "processing" and job.error is None
+
+
+def test_asr_errors_fail_the_job_once_retries_run_out(job, asr):
+    asr.side_effect = requests.ConnectionError("reset")
+    result = celery_app.transcribe_task.apply(args=("j1",))
+    assert result.failed() and asr.call_count == celery_app.transcribe_task.max_retries + 1
+    assert job.status == "error" and "reset" in job.error
+
+
+def test_other_asr_failures_are_not_retried(job, asr):
+    asr.side_effect = ValueError("bad audio")
+    assert celery_app.transcribe_task.apply(args=("j1",)).failed()
+    assert asr.call_count == 1 and job.status == "error"
+
+
+def test_cut_off_llm_reply_is_retried(job, llm):
+    llm.summarize.side_effect = [summarizer.LLMIncompleteError("length"), MagicMock()]
+    assert celery_app.summarize_task.apply(args=("j1",)).successful()
+    assert llm.summarize.call_count == 2
+    assert job.status == "done" and job.md_key == md_key("j1") and llm.uploads[md_key("j1")] == b"# md"
+
+
+def test_invalid_llm_output_fails_the_job(job, llm):
+    llm.summarize.side_effect = RuntimeError("Malformed ChunkOut JSON")
+    assert celery_app.summarize_task.apply(args=("j1",)).failed()
+    assert llm.summarize.call_count == 1 and job.status == "error"
+
+
+def test_chain_runs_transcribe_then_summarize(job, asr, llm):
+    chain = celery_app.pipeline_chain("j1")
+    assert [(t.task, t.args, t.immutable) for t in chain.tasks] == [
+        ("transcribe_task", ("j1",), True), ("summarize_task", ("j1",), True)
+    ]
+    chain.apply()
+    asr.assert_called_once()
+    assert llm.summarize.call_args.args[0] == llm.segments.return_value
+    assert job.status == "done"
+
+
+def test_old_task_name_starts_the_chain():
+    chain = MagicMock()
+    with patch("app.celery_app.pipeline_chain", chain):
+        celery_app.celery.tasks["run_pipeline_task"]("j1")
+    chain.assert_called_once_with("j1")
+    chain.return_value.delay.assert_called_once()
+
+
+def test_failed_render_releases_its_claim(job):
+    job.md_key = md_key("j1")
+    with patch("app.celery_app.exists", return_value=False), \
+            patch("app.celery_app.download_to_bytes", return_value=b"# md"), \
+            patch("app.celery_app.markdown_to_pdf_bytes", side_effect=RuntimeError("font missing")), \
+            patch("app.celery_app.release_render") as release:
+        with pytest.raises(RuntimeError):
+            celery_app.render_pdf_task("j1")
+    release.assert_called_once_with("j1")
+    assert job.pdf_key is None
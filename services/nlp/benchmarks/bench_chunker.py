@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Compare chunk_segments with chunk_by_length on multi-hour transcripts.
+
+Generates synthetic Persian ASR segments (about 4 s each, with occasional
+long pauses) and times both chunkers at matching budgets. Example:
+
+    python benchmarks/bench_chunker.py --hours 1,3,6 --max-tokens 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.chunker import CHARS_PER_TOKEN, chunk_by_length, chunk_segments  # noqa: E402
+
+WORDS = "قلب خون بیمار درمان دارو فشار عروق بطن دهلیز تشخیص علامت نوار سوال نکته مهم".split()
+
+
+def synthetic_segments(hours: float, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    segments, t = [], 0.0
+    while t < hours * 3600:
+        duration = rng.uniform(2, 6)
+        words = [rng.choice(WORDS) for _ in range(int(duration * 2.5))]
+        text = " ".join(words) + rng.choice(["", ".", "؟"])
+        segments.append({"start": t, "end": t + duration, "text": text})
+        t += duration + (rng.uniform(1.5, 4) if rng.random() < 0.05 else rng.uniform(0.05, 0.4))
+    return segments
+
+
+def best_of(fn, repeat: int) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", default="1,3,6")
+    parser.add_argument("--max-tokens", type=int, default=2000)
+    parser.add_argument("--overlap-tokens", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    max_chars = int(args.max_tokens * CHARS_PER_TOKEN)
+    results = []
+    for hours in (float(h) for h in args.hours.split(",")):
+        segments = synthetic_segments(hours)
+        text = "\n".join(s["text"] for s in segments)
+        old_s, old = best_of(lambda: chunk_by_length(text, max_chars=max_chars), args.repeat)
+        new_s, new = best_of(
+            lambda: chunk_segments(segments, args.max_tokens, args.overlap_tokens), args.repeat
+        )
+        results.append({
+            "hours": hours,
+            "segments": len(segments),
+            "chars": len(text),
+            "chunk_by_length": {"seconds": round(old_s, 4), "chunks": len(old)},
+            "chunk_segments": {"seconds": round(new_s, 4), "chunks": len(new)},
+            "speedup": round(old_s / new_s, 2),
+        })
+    print(json.dumps({"config": vars(args), "results": results}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Drive concurrent jobs through the real pipeline against local stand-ins.
+
+Starts in-process fakes for every external service:
+
+- ASR: streams NDJSON segments over a configurable time;
+- an OpenAI-compatible LLM: schema-valid JSON replies after a fixed
+  latency, streamed or not;
+- S3: an in-memory bucket speaking enough of the S3 REST API for boto3;
+- Redis (job outputs, PDF render claims): fakeredis;
+- a SQLite database in place of Postgres.
+
+It then runs ``preprocess_audio_task`` for N jobs with Celery in eager
+mode, so each job goes through the same tasks and HTTP/S3 calls as in
+production. Reports jobs per minute, per-stage task latency and peak RSS.
+Example:
+
+    python benchmarks/bench_pipeline.py --jobs 16 --concurrency 4 \\
+        --asr-seconds 2 --segments 300 --llm-latency 0.3
+
+Celery queues and separate worker tiers are not exercised; every stage of
+a job runs in one of ``--concurrency`` threads of this process.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = "قلب خون بیمار درمان دارو فشار عروق بطن دهلیز تشخیص علامت نوار سوال نکته مهم".split()
+
+
+def _serve(handler: type) -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def _read_body(handler: BaseHTTPRequestHandler) -> bytes:
+    return handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+
+
+class _Quiet(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def fake_asr(segments: int, seconds: float) -> type:
+    """``/transcribe`` streaming ``segments`` NDJSON segments spread over ``seconds``."""
+
+    class Handler(_Quiet):
+        def do_POST(self):
+            _read_body(self)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for i in range(segments):
+                time.sleep(seconds / segments)
+                text = " ".join(WORDS[(i + j) % len(WORDS)] for j in range(10))
+                event = {"type": "segment", "start": i * 4.0, "end": i * 4.0 + 3.5, "text": text, "words": []}
+                self.wfile.write(json.dumps(event, ensure_ascii=False).encode() + b"\n")
+                self.wfile.flush()
+            self.wfile.write(b'{"type": "done"}\n')
+
+    return Handler
+
+
+def _fake_reply(schema: str) -> dict:
+    section = {"heading": "سرفصل", "summary": "خلاصه " * 20, "key_points": ["نکته"], "traps": ["دام"]}
+    mcq = {"stem": "کدام گزینه صحیح است؟", "options": ["الف", "ب", "ج", "د"], "answer": "الف", "rationale": "طبق متن"}
+    return {
+        "ChunkOut": {"title": "جلسه", "sections": [section, section]},
+        "MCQSet": {"mcqs": [mcq] * 5},
+        "NightBefore": {"night_before": "مرور نکات طلایی."},
+    }.get(schema, {"title": "جلسه", "sections": [section], "mcqs": [], "night_before": ""})
+
+
+def _schema_name(body: dict) -> str:
+    fmt = body.get("response_format") or {}
+    if fmt.get("json_schema"):
+        return fmt["json_schema"]["name"]
+    # Guided JSON off: tell the task apart by the JSON shape in the prompt
+    prompt = body["messages"][-1]["content"]
+    return "MCQSet" if '"mcqs"' in prompt else "NightBefore" if '"night_before"' in prompt else "ChunkOut"
+
+
+def fake_llm(latency: float) -> type:
+    """OpenAI-style ``/v1/chat/completions`` answering after ``latency`` seconds."""
+
+    class Handler(_Quiet):
+        def do_POST(self):
+            body = json.loads(_read_body(self))
+            content = json.dumps(_fake_reply(_schema_name(body)), ensure_ascii=False)
+            usage = {"prompt_tokens": sum(len(m["content"]) for m in body["messages"]) // 4}
+            time.sleep(latency)
+            self.send_response(200)
+            if not body.get("stream"):
+                choice = {"message": {"content": content}, "finish_reason": "stop"}
+                data = json.dumps({"choices": [choice], "usage": usage}).encode()
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i in range(0, len(content), 16):
+                delta = {"choices": [{"delta": {"content": content[i:i + 16]}}]}
+                self.wfile.write(f"data: {json.dumps(delta)}\n\n".encode())
+            stop = {"choices": [{"delta": {}, "finish_reason": "stop"}]}
+            self.wfile.write(f"data: {json.dumps(stop)}\n\n".encode())
+            self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\ndata: [DONE]\n\n".encode())
+
+    return Handler
+
+
+def fake_s3() -> type:
+    """Path-style PUT/GET/HEAD of objects in one in-memory store (bucket creation is accepted)."""
+    objects: dict[str, tuple[bytes, str]] = {}
+    lock = threading.Lock()
+
+    class Handler(_Quiet):
+        # boto3 sends "Expect: 100-continue" on uploads; HTTP/1.0 makes it wait a second for nothing
+        protocol_version = "HTTP/1.1"
+
+        def _key(self) -> str:
+            return unquote(urlparse(self.path).path)
+
+        def _empty(self, status: int):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_PUT(self):
+            data = _read_body(self)
+            with lock:
+                objects[self._key()] = (data, self.headers.get("Content-Type", "application/octet-stream"))
+            self.send_response(200)
+            self.send_header("ETag", '"0"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_HEAD(self):
+            with lock:
+                obj = objects.get(self._key())
+            if obj is None:
+                return self._empty(404)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(obj[0])))
+            self.send_header("Content-Type", obj[1])
+            self.end_headers()
+
+        def do_GET(self):
+            with lock:
+                obj = objects.get(self._key())
+            if obj is None:
+                error = b"<Error><Code>NoSuchKey</Code><Message>not found</Message></Error>"
+                self.send_response(404)
+                self.send_header("Content-Type", "application/xml")
+                self.send_header("Content-Length", str(len(error)))
+                self.end_headers()
+                self.wfile.write(error)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", obj[1])
+            self.send_header("Content-Length", str(len(obj[0])))
+            self.end_headers()
+            self.wfile.write(obj[0])
+
+    return Handler
+
+
+def tone_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    """A steady tone, so preprocessing keeps it instead of trimming it as silence."""
+    frames = bytearray()
+    for i in range(int(seconds * sample_rate)):
+        v = int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate))
+        frames += v.to_bytes(2, "little", signed=True)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(bytes(frames))
+    return buf.getvalue()
+
+
+class PeakRSS:
+    """Sample this process's resident set size in a background thread (Linux)."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.page = os.sysconf("SC_PAGE_SIZE")
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _rss(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self.page
+        except (OSError, IndexError, ValueError):
+            return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start = self._rss()
+        self.peak = self.start
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _summary(values: list[float]) -> dict:
+    ordered = sorted(values)
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 3),
+        "p50": round(ordered[len(ordered) // 2], 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--segments", type=int, default=200, help="ASR segments per job")
+    parser.add_argument("--asr-seconds", type=float, default=1.0, help="time ASR takes to stream one job")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per LLM call")
+    parser.add_argument("--audio-seconds", type=float, default=5.0)
+    parser.add_argument("--preview", action="store_true", help="also run the preview transcript task")
+    parser.add_argument("--pdf", action="store_true", help="render each PDF after the job (needs WeasyPrint)")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    asr_url, llm_url, s3_url = _serve(fake_asr(args.segments, args.asr_seconds)), _serve(fake_llm(args.llm_latency)), _serve(fake_s3())
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    # Configuration is read at import time, so it has to be in place first
+    os.environ.update({
+        "POSTGRES_DSN": f"sqlite:///{workdir}/jobs.db",
+        "S3_ENDPOINT": s3_url,
+        "S3_BUCKET": "bench",
+        "AWS_REQUEST_CHECKSUM_CALCULATION": "when_required",
+        "ASR_URL": f"{asr_url}/transcribe",
+        "ASR_PREVIEW_MODEL": "base" if args.preview else "",
+        # The stand-in serves both tiers; a real preview needs its own deployment
+        "ASR_PREVIEW_URL": f"{asr_url}/transcribe",
+        "VLLM_URL": f"{llm_url}/v1",
+        "SUMMARIZER_BACKEND": "local",
+        "LLM_CACHE_TTL_SECONDS": "0",
+        "HTTP_POOL_PER_HOST": str(max(8, args.concurrency * 4)),
+    })
+    import fakeredis
+    import redis
+    # The app's Redis clients are created at import time from REDIS_URL
+    fake_redis = fakeredis.FakeRedis()
+    redis.Redis.from_url = classmethod(lambda cls, *a, **kw: fake_redis)
+    from celery.signals import task_postrun, task_prerun
+    from app.celery_app import celery, preprocess_audio_task, render_pdf_task
+    from app.models import Base, Job, SessionLocal, engine
+    from app.storage import upload_bytes
+
+    Base.metadata.create_all(engine)
+    celery.conf.task_always_eager = True
+    celery.conf.task_eager_propagates = True
+
+    # Eager tasks run nested inside the task that enqueued them (the chain
+    # inside preprocess_audio_task), so each stage is charged its own time
+    # minus that of the tasks it ran
+    running, stages, stages_lock = threading.local(), {}, threading.Lock()
+
+    @task_prerun.connect(weak=False)
+    def _start(**kwargs):
+        if not hasattr(running, "stack"):
+            running.stack = []
+        running.stack.append([time.perf_counter(), 0.0])
+
+    @task_postrun.connect(weak=False)
+    def _stop(task=None, **kwargs):
+        start, children = running.stack.pop()
+        elapsed = time.perf_counter() - start
+        if running.stack:
+            running.stack[-1][1] += elapsed
+        with stages_lock:
+            stages.setdefault(task.name, []).append(elapsed - children)
+
+    audio = tone_wav(args.audio_seconds)
+    db = SessionLocal()
+    job_ids = []
+    for i in range(args.jobs):
+        job = Job()
+        db.add(job)
+        db.commit()
+        job.audio_key = upload_bytes(f"jobs/{job.id}/audio/bench-{i}.wav", audio, "audio/wav")
+        db.commit()
+        job_ids.append(job.id)
+    db.close()
+
+    def run_job(job_id: str) -> float:
+        t0 = time.perf_counter()
+        preprocess_audio_task.delay(job_id)
+        if args.pdf:
+            render_pdf_task.delay(job_id)
+        return time.perf_counter() - t0
+
+    with PeakRSS() as rss:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = list(pool.map(run_job, job_ids))
+        elapsed = time.perf_counter() - t0
+
+    db = SessionLocal()
+    statuses = [db.get(Job, job_id).status for job_id in job_ids]
+    db.close()
+    report = {
+        "config": vars(args),
+        "jobs_done": statuses.count("done"),
+        "jobs_failed": len(statuses) - statuses.count("done"),
+        "seconds": round(elapsed, 3),
+        "jobs_per_minute": round(len(job_ids) / elapsed * 60, 2),
+        "job_latency": _summary(latencies),
+        "stage_latency": {name: _summary(values) for name, values in sorted(stages.items())},
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+        "rss_growth_mb": round((rss.peak - rss.start) / 2 ** 20, 1),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Compare PDF renders/sec of the per-call renderer with the warm renderer.
+
+"cold" rebuilds everything per document, as markdown_to_pdf_bytes used to:
+a new Markdown converter, the RTL stylesheet parsed from an inline <style>
+and font setup on every call. "warm" is the current markdown_to_pdf_bytes
+in processes initialized with warm_up(), like the render workers. Each
+mode runs in a pool of --processes long-lived processes. Example:
+
+    python benchmarks/bench_render.py --processes 1,4 --documents 40
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markdown import markdown as md_to_html  # noqa: E402
+from weasyprint import HTML  # noqa: E402
+from app.renderers import RTL_CSS, _safe_url_fetcher, markdown_to_pdf_bytes, summary_to_markdown, warm_up  # noqa: E402
+from app.schemas import MCQ, Section, SummarizeOut  # noqa: E402
+
+
+def sample_markdown(sections: int) -> str:
+    out = SummarizeOut(
+        title="جلسه قلب و عروق",
+        sections=[
+            Section(
+                heading=f"بخش {i}",
+                summary="نارسایی قلبی با کاهش برون‌ده قلب و احتقان همراه است. " * 6,
+                key_points=["داروی خط اول", "پایش فشار خون", "علائم هشدار"],
+                traps=["اشتباه گرفتن با بیماری ریوی"]
+            )
+            for i in range(1, sections + 1)
+        ],
+        mcqs=[MCQ(stem="کدام گزینه صحیح است؟", options=["الف", "ب", "ج", "د"], answer="الف", rationale="طبق متن")] * 5,
+        night_before="مرور نکات طلایی هر بخش."
+    )
+    return summary_to_markdown(out)
+
+
+def render_cold(md_text: str) -> int:
+    html = f"<style>{RTL_CSS}</style>{md_to_html(md_text, output_format='xhtml')}"
+    return len(HTML(string=html, base_url="about:blank", url_fetcher=_safe_url_fetcher).write_pdf())
+
+
+def render_warm(md_text: str) -> int:
+    return len(markdown_to_pdf_bytes(md_text))
+
+
+def run(mode: str, processes: int, documents: list[str]) -> dict:
+    render, initializer = (render_warm, warm_up) if mode == "warm" else (render_cold, None)
+    with Pool(processes, initializer=initializer) as pool:
+        # One document per process first, so pool start-up is not timed
+        pool.map(render, documents[:processes], chunksize=1)
+        t0 = time.perf_counter()
+        sizes = pool.map(render, documents, chunksize=1)
+        elapsed = time.perf_counter() - t0
+    return {
+        "seconds": round(elapsed, 3),
+        "renders_per_sec": round(len(documents) / elapsed, 2),
+        "mean_pdf_bytes": sum(sizes) // len(sizes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", default="1,4")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--sections", type=int, default=12)
+    args = parser.parse_args()
+
+    documents = [sample_markdown(args.sections)] * args.documents
+    results = []
+    for processes in (int(p) for p in args.processes.split(",")):
+        cold = run("cold", processes, documents)
+        warm = run("warm", processes, documents)
+        results.append({
+            "processes": processes,
+            "cold": cold,
+            "warm": warm,
+            "speedup": round(warm["renders_per_sec"] / cold["renders_per_sec"], 2),
+        })
+    print(json.dumps({"config": vars(args), "results": results}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()